@@ -0,0 +1,82 @@
+from SlideRuleProject import compose_sheet, load_scale, read_manifest
+from SlideRuleScale import SlideRuleScale
+import os
+import tempfile
+import time
+
+# Compares the time and output size of the svg rendering backends on a large scale (18,001 positions), and the output
+# size of the VisualExample scales with inline styles, css classes and css classes grouped by style
+
+
+# Writes the specs of a large C scale, from 1 to 10, to specs_dir
+def write_large_specs(specs_dir):
+    os.makedirs(specs_dir + "scale/")
+    text = "sans-serif,1.4,start,0,-0.8,90"
+    with open(specs_dir + "scale/Core.csv", "w") as file:
+        file.write("name,l_position_tip,l_position_base,l_width,t_font,t_size,t_anchor,t_position_x,t_position_y,"
+                   "t_angle\n"
+                   "1,9,0,0.2," + text + "\n"
+                   "2,9,0,0.2," + text + "\n"
+                   "10,9,0,0.2," + text + "\n")
+    for bounds, intervals in [("1-2", ["0.1", "0.01", "0.0001"]), ("2-10", ["1", "0.1", "0.001"])]:
+        with open(specs_dir + "scale/" + bounds + ".csv", "w") as file:
+            file.write("interval,l_position_tip,l_position_base,l_width,"
+                       "t_font,t_size,t_anchor,t_position_x,t_position_y,t_angle\n"
+                       + intervals[0] + ",6,0,0.2," + text + "\n"
+                       + intervals[1] + ",5,0,0.1," + text + "\n"
+                       + intervals[2] + ",4,0,0.05,,,,,,\n")
+    with open(specs_dir + "draw_straight.csv", "w") as file:
+        file.write("paper_size_x,paper_size_y,scale_size_x,scale_origin_x,scale_origin_y,mark_origin_y,line_width,"
+                   "strip_zeros\n3400,40,3000,200,10,13,0.2,0\n")
+    with open(specs_dir + "draw_circular.csv", "w") as file:
+        file.write("paper_size,limit_radius,scale_radius,mark_radius,centermark_size,line_width,strip_zeros\n"
+                   "1400,700,500,530,10,0.2,0\n")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as temp_dir:
+        specs_dir = temp_dir + "/specs/"
+        write_large_specs(specs_dir)
+        Scale = SlideRuleScale(specs_dir + "scale/")
+        Scale.set_scale_type("c")
+        print("Positions: " + str(len(Scale.scale_spec)))
+
+        print("{:<10} {:<22} {:>10} {:>12}".format("Scale", "Backend", "Time (s)", "Size (kB)"))
+        for draw in ["straight", "circular"]:
+            reference_time = None
+            for backend, merge_lines in [("svgwrite", False), ("stream", False), ("stream", True)]:
+                output = temp_dir + "/" + draw + ".svg"
+                start = time.perf_counter()
+                getattr(Scale, "draw_" + draw)(output, specs_dir + "draw_" + draw + ".csv",
+                                               backend=backend, merge_lines=merge_lines)
+                elapsed = time.perf_counter() - start
+                if reference_time is None:
+                    reference_time = elapsed
+                print("{:<10} {:<22} {:>10.3f} {:>12.0f}   x{:.1f}".format(
+                    draw, backend + (" (merged lines)" if merge_lines else ""), elapsed,
+                    os.path.getsize(output) / 1000, reference_time / elapsed))
+
+        # VisualExample: all scales drawn separately, and both sides composed as sheets
+        print("\n{:<30} {:>12} {:>12}".format("VisualExample", "Scales (kB)", "Sheets (kB)"))
+        manifest = os.path.join(os.path.dirname(os.path.abspath(__file__)), "VisualExample", "project.csv")
+        jobs = read_manifest(manifest)
+        for name, options in [("inline styles", {}), ("css classes", {"css_classes": True}),
+                              ("css classes, grouped", {"css_classes": True, "group_styles": True})]:
+            size = 0
+            for job in jobs:
+                scale = load_scale(job)
+                scale.set_scale_type(job["scale_type"], invert_scale=job["invert_scale"],
+                                     positioning_factor=job["positioning_factor"], log_base=job["log_base"])
+                output = temp_dir + "/" + job["name"] + ".svg"
+                getattr(scale, "draw_" + job["draw"])(output, job["draw_specs"], backend="stream", **options)
+                size += os.path.getsize(output)
+            sheet_size = None
+            if options:
+                sheet_size = 0
+                for side in ["Obverse", "Reverse"]:
+                    output = temp_dir + "/" + side + ".svg"
+                    compose_sheet(manifest, output, names=[job["name"] for job in jobs if job["name"].startswith(side)],
+                                  group_styles=options.get("group_styles", False))
+                    sheet_size += os.path.getsize(output)
+            print("{:<30} {:>12.1f} {:>12}".format(name, size / 1000,
+                                                   "-" if sheet_size is None else "{:.1f}".format(sheet_size / 1000)))
@@ -0,0 +1,73 @@
+from ScaleTypes import get_scale_type
+import numpy as np
+import time
+import tracemalloc
+
+# Compares the time and the memory allocated while calculating the positions of each scale type on a large tick table
+# (1,000,000 positions), in a single buffer (ScaleTypes) and as a chain of numpy expressions, each creating a new array.
+# Memory is the peak allocated during the calculation, in arrays of the size of the tick table
+
+
+# Positions of each scale type as a chain of numpy expressions, as set_scale_type calculated them before scale types
+# were registered
+def chained_positions(scale_type, position, invert_scale, positioning_factor, log_base):
+    if scale_type == "c":
+        position = position * positioning_factor
+    elif scale_type == "a":
+        position = np.power(position * positioning_factor, 1./2)
+    elif scale_type == "k":
+        position = np.power(position * positioning_factor, 1./3)
+    elif scale_type == "st":
+        position = np.radians(position) * positioning_factor
+    elif scale_type == "s":
+        position = np.sin(np.radians(position)) * positioning_factor
+    elif scale_type == "t":
+        position = np.tan(np.radians(position)) * positioning_factor
+    elif scale_type == "p":
+        position = np.power(1 - np.power(position, 2), 1./2) * positioning_factor
+    elif scale_type == "l":
+        position = np.power(log_base, position * positioning_factor)
+    position = np.round(np.log(position) / np.log(log_base), 10)
+    if bool(invert_scale):
+        position = 1.0 - position
+    return position
+
+
+# Measures a calculation: returns its result, its best time in seconds out of repeat runs and its peak memory in arrays
+# of size positions. Memory is measured in a separate run, as tracing slows the calculation down
+def measure(calculate, positions, repeat=5):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = calculate()
+        elapsed.append(time.perf_counter() - start)
+    tracemalloc.start()
+    calculate()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, min(elapsed), peak / (positions * 8)
+
+
+if __name__ == "__main__":
+    positions = 1000000
+    cases = [("c", 1, np.linspace(1, 10, positions)),
+             ("a", 1, np.linspace(1, 100, positions)),
+             ("k", 1, np.linspace(1, 1000, positions)),
+             ("st", 10, np.linspace(0.573, 5.73, positions)),
+             ("s", 10, np.linspace(5.74, 90, positions)),
+             ("t", 10, np.linspace(5.72, 45, positions)),
+             ("p", 10, np.linspace(0, 0.995, positions)),
+             ("l", 1, np.linspace(0, 1, positions))]
+
+    print("{:<6} {:>14} {:>14} {:>16} {:>16}".format("Type", "Chained (s)", "Fused (s)", "Chained (arrays)",
+                                                   "Fused (arrays)"))
+    for scale_type, positioning_factor, position in cases:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            chained, chained_time, chained_memory = measure(
+                lambda: chained_positions(scale_type, position, True, positioning_factor, 10), positions)
+            fused, fused_time, fused_memory = measure(
+                lambda: get_scale_type(scale_type).positions(position, True, positioning_factor, 10), positions)
+        if not np.array_equal(chained, fused, equal_nan=True):
+            raise AssertionError("Positions of scale type " + scale_type + " are different")
+        print("{:<6} {:>14.4f} {:>14.4f} {:>16.1f} {:>16.1f}".format(scale_type, chained_time, fused_time,
+                                                                   chained_memory, fused_memory))
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from TickTable import TickTable
+
+
+# Fingerprints the given parts (strings, bytes or numbers) into a hexadecimal key. Each part is length prefixed, so
+# different splits of the same content have different fingerprints
+def digest(*parts):
+    hasher = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode()
+        hasher.update(len(part).to_bytes(8, "little"))
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+# On-disk cache of build results, keyed by fingerprints of their inputs:
+# - Tick tables of each sector, keyed by the sector bounds and the content of its x-y.csv file
+# - Drawn svg files, keyed by the content of all spec files, the scale type parameters and the draw specs
+# Entries are evicted, least recently used first, when the cache grows over max_size bytes.
+# The cache may be shared by several processes: entries are written to temporary files and then moved into place
+class BuildCache:
+    # Changes whenever the build results change for the same inputs, so that old entries are not reused
+    VERSION = "3"
+
+    def __init__(self, cache_dir, max_size=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Gets the cache key for the given parts
+    def key(self, *parts):
+        return digest(self.VERSION, *parts)
+
+    # Loads a tick table from the cache. Returns None if it is not cached
+    def load_table(self, key):
+        path = self._hit(key + ".npz")
+        if path is None:
+            return None
+        try:
+            return TickTable.load(path)
+        except (OSError, ValueError, KeyError):  # Removed by another process or incomplete
+            return None
+
+    # Saves a tick table in the cache
+    def save_table(self, key, tick_table):
+        self._store(key + ".npz", lambda file: tick_table.save(file))
+
+    # Copies a cached file to destination. Returns whether it was cached
+    def load_file(self, key, destination):
+        path = self._hit(key + os.path.splitext(destination)[1])
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:  # Removed by another process
+            return False
+        return True
+
+    # Saves a copy of the source file in the cache
+    def save_file(self, key, source):
+        with open(source, "rb") as source_file:
+            self._store(key + os.path.splitext(source)[1], lambda file: shutil.copyfileobj(source_file, file))
+
+    # Total size of the cache entries, in bytes
+    def size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.is_file())
+
+    # Removes the least recently used entries until the cache size is at most max_size
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # Removed by another process
+                pass
+            size -= entry_size
+
+    # Gets the path of a cached entry, marking it as recently used. Returns None if it is not cached
+    def _hit(self, name):
+        path = os.path.join(self.cache_dir, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    # Writes an entry with the given writer function, then evicts entries if the cache is too large
+    def _store(self, name, writer):
+        descriptor, temporary_path = tempfile.mkstemp(prefix=".", dir=self.cache_dir)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                writer(file)
+            os.replace(temporary_path, os.path.join(self.cache_dir, name))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        self.evict()
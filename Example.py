@@ -1,6 +1,10 @@
 from SlideRuleScale import SlideRuleScale
+import logging
 import os
 
+# Shows the progress messages of each stage
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+
 os.chdir("./Example/")
 
 Example = SlideRuleScale("./specs/scale/")
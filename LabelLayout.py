@@ -0,0 +1,139 @@
+import math
+
+import numpy as np
+
+
+# Lays out the labels of a scale so that they don't overlap: labels are placed one at a time, from highest to lowest
+# priority, and labels that overlap an already placed label are shortened or hidden.
+# - Each label is approximated by a rectangle around its text, rotated with it. Its width is the number of characters
+#   times char_width times the text size, and its height goes from ascent times the text size above the baseline to
+#   descent times the text size below it. Rectangles are grown by margin (mm) on every side
+# - Placed labels are kept in a grid of square cells (a spatial index), so each label is only checked against the
+#   labels placed in the cells it covers, instead of against all labels. This works the same for straight and circular
+#   scales, as labels are indexed by their position on the paper
+# - shorten: whether overlapping labels with decimals should be tried with only their decimals (1.25 as 25) before
+#   being hidden
+class LabelLayout:
+    def __init__(self, char_width=0.6, ascent=0.75, descent=0.25, margin=0.1, shorten=False):
+        self.char_width = char_width
+        self.ascent = ascent
+        self.descent = descent
+        self.margin = margin
+        self.shorten = shorten
+
+    # Lays out the labels of a scale geometry (see SlideRuleScale.geometry_straight). names, sizes and anchors are the
+    # name, t_size and t_anchor of each position of the geometry. Labels with higher priority are placed first. By
+    # default, labels of longer lines, and then of larger texts, have higher priority.
+    # Returns whether each label is shown, and the text of each label (shortened or not)
+    def layout(self, geometry, names, sizes, anchors, line_lengths=None, priority=None):
+        names = list(names)
+        texts = list(names)
+        shown = np.zeros(len(names), dtype=bool)
+        has_text = np.asarray(geometry["has_text"])
+        if not has_text.any():
+            return shown, texts
+
+        if priority is None:
+            line_lengths = np.zeros(len(names)) if line_lengths is None else np.abs(line_lengths)
+            # Longer lines first, then larger texts. Ties keep the order of the scale
+            order = np.lexsort((-np.nan_to_num(np.asarray(sizes, dtype=float)), -np.round(line_lengths, 6)))
+        else:
+            order = np.argsort(-np.asarray(priority, dtype=float), kind="stable")
+        order = order[has_text[order]]
+
+        rectangles = self.rectangles(geometry, [len(name) for name in names], sizes, anchors)
+        # Shortened texts only keep the decimals of the name. Names without decimals can't be shortened
+        short_texts = [name.split(".")[1] if self.shorten and "." in name else "" for name in names]
+        short_rectangles = self.rectangles(geometry, [len(text) for text in short_texts], sizes, anchors)
+
+        # Grid cells are about the size of a typical label, so that each label covers only a few cells
+        cell_size = max(float(np.median(np.maximum(rectangles[2], rectangles[3])[order])) * 2, 1e-6)
+        grid = {}
+        placed = []
+
+        for i in order.tolist():
+            rectangle = _rectangle(rectangles, i)
+            if not self._fits(rectangle, grid, placed, cell_size):
+                if not short_texts[i]:
+                    continue
+                rectangle = _rectangle(short_rectangles, i)
+                if not self._fits(rectangle, grid, placed, cell_size):
+                    continue
+                texts[i] = short_texts[i]
+            self._place(rectangle, grid, placed, cell_size)
+            shown[i] = True
+        return shown, texts
+
+    # Calculates the rectangle of each label, for all labels at once: center x and y, half width, half height, and
+    # cosine and sine of its angle
+    def rectangles(self, geometry, lengths, sizes, anchors):
+        sizes = np.nan_to_num(np.asarray(sizes, dtype=float))
+        width = np.asarray(lengths, dtype=float) * self.char_width * sizes
+        # Horizontal start of the text relative to its anchor, in the rotated system of the text
+        start = np.select([np.asarray(anchors) == "middle", np.asarray(anchors) == "end"], [-width / 2, -width], 0)
+        # Center of the rectangle relative to the anchor. Svg y grows downwards, so the text goes up to -ascent
+        center_x = start + width / 2
+        center_y = (self.descent - self.ascent) * sizes / 2
+
+        angle = np.radians(np.nan_to_num(np.asarray(geometry["label_angle"], dtype=float)))
+        cos_angle = np.cos(angle)
+        sin_angle = np.sin(angle)
+        return (np.asarray(geometry["label_x"]) + center_x * cos_angle - center_y * sin_angle,
+                np.asarray(geometry["label_y"]) + center_x * sin_angle + center_y * cos_angle,
+                width / 2 + self.margin,
+                (self.ascent + self.descent) * sizes / 2 + self.margin,
+                cos_angle,
+                sin_angle)
+
+    # Gets the grid cells covered by the axis aligned box of a rectangle
+    @staticmethod
+    def _cells(rectangle, cell_size):
+        for cell_x in range(math.floor(rectangle[6] / cell_size), math.floor(rectangle[8] / cell_size) + 1):
+            for cell_y in range(math.floor(rectangle[7] / cell_size), math.floor(rectangle[9] / cell_size) + 1):
+                yield cell_x, cell_y
+
+    # Checks whether a rectangle doesn't overlap any placed rectangle in the cells it covers
+    def _fits(self, rectangle, grid, placed, cell_size):
+        checked = set()
+        for cell in self._cells(rectangle, cell_size):
+            for j in grid.get(cell, ()):
+                if j not in checked:
+                    checked.add(j)
+                    if _overlap(rectangle, placed[j]):
+                        return False
+        return True
+
+    # Places a rectangle in the grid
+    def _place(self, rectangle, grid, placed, cell_size):
+        for cell in self._cells(rectangle, cell_size):
+            grid.setdefault(cell, []).append(len(placed))
+        placed.append(rectangle)
+
+
+# Gets the rectangle of a label as a tuple of floats, with the bounds of its axis aligned box at the end
+def _rectangle(rectangles, i):
+    x, y, half_width, half_height, cos_angle, sin_angle = [float(values[i]) for values in rectangles]
+    extent_x = abs(half_width * cos_angle) + abs(half_height * sin_angle)
+    extent_y = abs(half_width * sin_angle) + abs(half_height * cos_angle)
+    return x, y, half_width, half_height, cos_angle, sin_angle, x - extent_x, y - extent_y, x + extent_x, y + extent_y
+
+
+# Checks whether two rotated rectangles overlap, by looking for an axis that separates them (separating axis theorem).
+# First checks their axis aligned boxes, which is enough for most pairs
+def _overlap(a, b):
+    if a[8] <= b[6] or b[8] <= a[6] or a[9] <= b[7] or b[9] <= a[7]:
+        return False
+    distance_x = b[0] - a[0]
+    distance_y = b[1] - a[1]
+    for cos_angle, sin_angle in [(a[4], a[5]), (-a[5], a[4]), (b[4], b[5]), (-b[5], b[4])]:
+        # Projection of the distance between centers and of the half sizes of both rectangles on the axis
+        distance = abs(distance_x * cos_angle + distance_y * sin_angle)
+        if distance >= _extent(a, cos_angle, sin_angle) + _extent(b, cos_angle, sin_angle):
+            return False
+    return True
+
+
+# Gets the half size of a rectangle projected on an axis
+def _extent(rectangle, cos_angle, sin_angle):
+    return (abs(rectangle[2] * (rectangle[4] * cos_angle + rectangle[5] * sin_angle)) +
+            abs(rectangle[3] * (rectangle[4] * sin_angle - rectangle[5] * cos_angle)))
@@ -0,0 +1,179 @@
+import math
+import struct
+import zlib
+
+import numpy as np
+
+
+# Grayscale png preview of a scale, drawn straight from the line geometry, without generating an svg.
+# Lines (and circles, as polylines) are collected first, and drawn when the image is saved, one band of rows at a time:
+# each band is drawn in its own buffer and compressed into the png before the next one is drawn, so memory stays bounded
+# by the band size at any resolution.
+# Lines are anti-aliased: each line is sampled as a grid of points every half pixel, along and across it, and each
+# point adds the area it stands for to the 4 pixels around it. The coverage of each pixel is its shade of gray.
+# - filename: name of the output file, or a file-like object opened in binary mode
+# - size: width and height of the image, in mm
+# - dpi: resolution, in pixels per inch
+# - max_pixels: number of pixels of each band
+# - max_samples: number of points sampled at once in each band
+class RasterPreview:
+    SAMPLE_STEP = 0.5
+    # Longest line drawn at once, in pixels. Longer lines are split, so that the points of any line fit in a group
+    PIECE_LENGTH = 128
+
+    def __init__(self, filename, size, dpi=150, max_pixels=1024 * 1024, max_samples=64 * 1024):
+        self.filename = filename
+        self.scale = dpi / 25.4
+        self.width = max(int(math.ceil(size[0] * self.scale)), 1)
+        self.height = max(int(math.ceil(size[1] * self.scale)), 1)
+        self.max_pixels = max_pixels
+        self.max_samples = max_samples
+        # Lines to be drawn, in blocks of arrays: x and y of start and end, width (in pixels) and intensity
+        self._lines = []
+
+    # Adds lines from (x_start, y_start) to (x_end, y_end), in mm, all at once. intensity is the shade of the lines,
+    # from 0 (white) to 1 (black)
+    def lines(self, x_start, y_start, x_end, y_end, width, intensity=1.0):
+        columns = np.broadcast_arrays(*[np.asarray(values, dtype=float)
+                                        for values in [x_start, y_start, x_end, y_end, width, intensity]])
+        x_start, y_start, x_end, y_end, width, intensity = [column.ravel() for column in columns]
+        x_start, y_start, x_end, y_end, width = [values * self.scale for values in [x_start, y_start, x_end, y_end,
+                                                                                     width]]
+        # Splits long lines into pieces of the same length
+        pieces = np.maximum(np.ceil(np.hypot(x_end - x_start, y_end - y_start) / self.PIECE_LENGTH), 1).astype(np.int64)
+        line = np.repeat(np.arange(len(pieces)), pieces)
+        piece = np.arange(len(line)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        start = piece / pieces[line]
+        end = (piece + 1) / pieces[line]
+        delta_x = (x_end - x_start)[line]
+        delta_y = (y_end - y_start)[line]
+        self._lines.append([x_start[line] + start * delta_x, y_start[line] + start * delta_y,
+                            x_start[line] + end * delta_x, y_start[line] + end * delta_y,
+                            width[line], intensity[line]])
+
+    # Adds a circle, as a polyline with segments of about 2 pixels
+    def circle(self, center, r, width, intensity=1.0):
+        segments = max(int(math.ceil(2 * math.pi * r * self.scale / 2)), 16)
+        theta = np.linspace(0, 2 * np.pi, segments + 1)
+        x = center[0] + r * np.cos(theta)
+        y = center[1] + r * np.sin(theta)
+        self.lines(x[:-1], y[:-1], x[1:], y[1:], width, intensity)
+
+    # Draws all lines and writes the png. Closes the output file if it was opened here
+    def save(self):
+        if hasattr(self.filename, "write"):
+            file = self.filename
+        else:
+            file = open(self.filename, "wb")
+        try:
+            self._write_png(file)
+        finally:
+            if file is not self.filename:
+                file.close()
+
+    def _write_png(self, file):
+        lines = [np.concatenate(columns) for columns in zip(*self._lines)] if self._lines else [np.zeros(0)] * 6
+        x_start, y_start, x_end, y_end, width, intensity = lines
+        # Rows covered by each line, with margin for its width and for the points sampled around each pixel
+        margin = width / 2 + 1
+        top = np.minimum(y_start, y_end) - margin
+        bottom = np.maximum(y_start, y_end) + margin
+
+        file.write(b"\x89PNG\r\n\x1a\n")
+        _write_chunk(file, b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 0, 0, 0, 0))
+        compressor = zlib.compressobj()
+        band_height = max(self.max_pixels // self.width, 1)
+        for band_start in range(0, self.height, band_height):
+            band_end = min(band_start + band_height, self.height)
+            selected = np.flatnonzero((bottom >= band_start) & (top < band_end))
+            coverage = self._draw_band([column[selected] for column in lines], band_start, band_end)
+            # Each row starts with its filter type (none)
+            pixels = np.empty((band_end - band_start, self.width + 1), dtype=np.uint8)
+            pixels[:, 0] = 0
+            pixels[:, 1:] = np.rint(255 * (1 - np.minimum(coverage, 1)))
+            data = compressor.compress(pixels.tobytes())
+            if data:
+                _write_chunk(file, b"IDAT", data)
+        _write_chunk(file, b"IDAT", compressor.flush())
+        _write_chunk(file, b"IEND", b"")
+
+    # Draws the lines that cross a band of rows. Returns the coverage of each pixel of the band
+    def _draw_band(self, lines, band_start, band_end):
+        x_start, y_start, x_end, y_end, width, intensity = lines
+        coverage = np.zeros((band_end - band_start) * self.width)
+        length = np.hypot(x_end - x_start, y_end - y_start)
+
+        # Points are sampled every SAMPLE_STEP along each line, always at the same points of the line in every band.
+        # Only the points of the part of the line that crosses the band are sampled
+        along = np.maximum(np.ceil(length / self.SAMPLE_STEP), 1).astype(np.int64)
+        across = np.maximum(np.ceil(width / self.SAMPLE_STEP), 1).astype(np.int64)
+        margin = width / 2 + 1
+        delta_y = y_end - y_start
+        with np.errstate(divide="ignore", invalid="ignore"):
+            first = (band_start - margin - y_start) / delta_y
+            last = (band_end + margin - y_start) / delta_y
+        horizontal = np.abs(delta_y) < 1e-12
+        first, last = np.where(horizontal, 0, np.minimum(first, last)), np.where(horizontal, 1, np.maximum(first, last))
+        first = np.clip(np.floor(np.clip(first, 0, 1) * along), 0, along).astype(np.int64)
+        last = np.clip(np.ceil(np.clip(last, 0, 1) * along), 0, along).astype(np.int64)
+        samples = (last - first) * across
+
+        # Lines are drawn in groups of about max_samples points
+        group_start = 0
+        cumulative = np.cumsum(samples)
+        while group_start < len(samples):
+            done = cumulative[group_start - 1] if group_start > 0 else 0
+            group_end = max(int(np.searchsorted(cumulative, done + self.max_samples, side="right")), group_start + 1)
+            group = slice(group_start, group_end)
+            self._draw_points(coverage, band_start, band_end,
+                              x_start[group], y_start[group], x_end[group], y_end[group], width[group],
+                              intensity[group], length[group], along[group], across[group], first[group],
+                              samples[group])
+            group_start = group_end
+        return coverage.reshape(band_end - band_start, self.width)
+
+    # Samples the points of a group of lines, and adds their area to the coverage of the pixels around them
+    def _draw_points(self, coverage, band_start, band_end, x_start, y_start, x_end, y_end, width, intensity, length,
+                     along, across, first, samples):
+        total = int(samples.sum())
+        if total == 0:
+            return
+        line = np.repeat(np.arange(len(samples)), samples)
+        offset = np.arange(total) - np.repeat(np.cumsum(samples) - samples, samples)
+        i_along = first[line] + offset // across[line]
+        i_across = offset % across[line]
+
+        t = (i_along + 0.5) / along[line]
+        u = ((i_across + 0.5) / across[line] - 0.5) * width[line]
+        # Unit normal of each line
+        with np.errstate(divide="ignore", invalid="ignore"):
+            normal_x = np.where(length > 0, -(y_end - y_start) / length, 0)[line]
+            normal_y = np.where(length > 0, (x_end - x_start) / length, 0)[line]
+        x = x_start[line] + t * (x_end - x_start)[line] + u * normal_x - 0.5
+        y = y_start[line] + t * (y_end - y_start)[line] + u * normal_y - 0.5 - band_start
+        # Area that each point stands for: its share of the length and width of its line
+        area = (intensity * np.maximum(length, self.SAMPLE_STEP) / along * width / across)[line]
+
+        column = np.floor(x)
+        row = np.floor(y)
+        fraction_x = x - column
+        fraction_y = y - row
+        column = column.astype(np.int64)
+        row = row.astype(np.int64)
+        height = band_end - band_start
+        pixels = []
+        weights = []
+        for step_x, weight_x in [(0, 1 - fraction_x), (1, fraction_x)]:
+            for step_y, weight_y in [(0, 1 - fraction_y), (1, fraction_y)]:
+                pixel_x = column + step_x
+                pixel_y = row + step_y
+                inside = (pixel_x >= 0) & (pixel_x < self.width) & (pixel_y >= 0) & (pixel_y < height)
+                pixels.append((pixel_y * self.width + pixel_x)[inside])
+                weights.append((area * weight_x * weight_y)[inside])
+        coverage += np.bincount(np.concatenate(pixels), weights=np.concatenate(weights), minlength=len(coverage))
+
+
+# Writes a png chunk: its length, type, data and checksum
+def _write_chunk(file, chunk_type, data):
+    file.write(struct.pack(">I", len(data)) + chunk_type + data +
+               struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
@@ -0,0 +1,165 @@
+import hashlib
+import itertools
+
+import numpy as np
+
+
+# Scale type: how the numbers of a scale are turned into the values whose logarithm is their position
+# - description: shown in the log when the scale type is set
+# - transform: function(position, out, log_base) that writes the transformed positions into out, a float array of the
+#              same size. position may be out itself, so the transform should work in place, with the out argument of
+#              numpy functions, instead of creating temporary arrays
+# - factor: "before" if positions are multiplied by the positioning factor before the transform, "after" if the
+#           transformed positions are
+# Each scale type has a fingerprint of its description, factor and transform code, that is kept in the cache keys of
+# drawings, and a serial, set when it is registered, that tells it apart from the scale types it replaces
+class ScaleType:
+    def __init__(self, description, transform, factor="before"):
+        if factor not in ["before", "after"]:
+            raise ValueError("Invalid factor: '" + str(factor) + "'. Use 'before' or 'after'")
+        self.description = description
+        self.transform = transform
+        self.factor = factor
+        self.fingerprint = _fingerprint(description, transform, factor)
+        self.serial = None
+
+    # Calculates the positions of a scale, from 0 to 1 for its main part, in a single buffer: every step after the first
+    # one writes over the result of the previous one
+    def positions(self, position, invert_scale, positioning_factor, log_base):
+        out = np.empty(len(position), dtype=float)
+        if self.factor == "before":
+            np.multiply(position, positioning_factor, out=out)
+            self.transform(out, out, log_base)
+        else:
+            self.transform(position, out, log_base)
+            np.multiply(out, positioning_factor, out=out)
+        # Applies log with base log_base, and rounds final result to avoid issues with bounds and coincidence checks.
+        # Positions are exact, but logarithms and trigonometric functions of them are not (log10(1000) may not be 3)
+        np.log(out, out=out)
+        np.divide(out, np.log(log_base), out=out)
+        np.round(out, 10, out=out)
+        if bool(invert_scale):
+            np.subtract(1.0, out, out=out)
+        return out
+
+
+# Registered scale types, by name. Names are case sensitive: each type is registered with all its aliases
+SCALE_TYPES = {}
+# Serials of the registered scale types
+_serials = itertools.count(1)
+
+
+# Registers a scale type with all its names, so that it can be used in set_scale_type. See ScaleType for the arguments.
+# - replace: whether names that are already registered may be replaced. Scales that already had the replaced type set
+#            keep their positions until the scale type is set again
+def register_scale_type(names, description, transform, factor="before", replace=False):
+    if isinstance(names, str):
+        names = [names]
+    if not replace:
+        for name in names:
+            if name in SCALE_TYPES:
+                raise ValueError("Scale type already registered: '" + name + "'")
+    scale_type = ScaleType(description, transform, factor)
+    scale_type.serial = next(_serials)
+    for name in names:
+        SCALE_TYPES[name] = scale_type
+    return scale_type
+
+
+# Gets a registered scale type by name
+def get_scale_type(name):
+    try:
+        return SCALE_TYPES[name]
+    except KeyError:
+        raise ValueError("Unknown scale type: '" + name + "'") from None
+
+
+# Fingerprints a scale type from its description, factor and the code of its transform (bytecode, constants and names).
+# Transforms without code (such as numpy functions or partials) are fingerprinted by their repr
+def _fingerprint(description, transform, factor):
+    code = getattr(transform, "__code__", None)
+    if code is None:
+        parts = [repr(transform)]
+    else:
+        constants = [constant.co_code if hasattr(constant, "co_code") else constant for constant in code.co_consts]
+        parts = [getattr(transform, "__qualname__", ""), code.co_code, repr(constants), repr(code.co_names)]
+    hasher = hashlib.sha256()
+    for part in [description, factor] + parts:
+        part = part if isinstance(part, bytes) else part.encode()
+        hasher.update(len(part).to_bytes(8, "little"))
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+#  x | # -> log(#)
+def _identity(position, out, log_base):
+    if position is not out:
+        np.copyto(out, position)
+
+
+#  x² | √# -> log(#)
+def _square_root(position, out, log_base):
+    np.power(position, 1./2, out=out)
+
+
+#  x³ | ∛# -> log(#)
+def _cube_root(position, out, log_base):
+    np.power(position, 1./3, out=out)
+
+
+# arcsin(x) or arctan(x) or deg(x rad) | rad(# deg) -> log(#)
+def _radians(position, out, log_base):
+    np.radians(position, out=out)
+
+
+# arcsin(x) | sin(# deg) -> log(#)
+def _sine(position, out, log_base):
+    np.radians(position, out=out)
+    np.sin(out, out=out)
+
+
+# arctan(x) | tan(# deg) -> log(#)
+def _tangent(position, out, log_base):
+    np.radians(position, out=out)
+    np.tan(out, out=out)
+
+
+# √(1-x²) | √(1-#²) -> log(#) | Used with right-angled triangles and to obtain cos from sin
+def _pythagorean(position, out, log_base):
+    np.power(position, 2, out=out)
+    np.subtract(1, out, out=out)
+    np.power(out, 1./2, out=out)
+
+
+# log(x) | log_base ^ (#) -> log(#)
+def _power(position, out, log_base):
+    np.power(log_base, position, out=out)
+
+
+# e^x | ln(#) -> log(#)
+def _natural_log(position, out, log_base):
+    np.log(position, out=out)
+
+
+# arsinh(x) | sinh(#) -> log(#)
+def _hyperbolic_sine(position, out, log_base):
+    np.sinh(position, out=out)
+
+
+# artanh(x) | tanh(#) -> log(#)
+def _hyperbolic_tangent(position, out, log_base):
+    np.tanh(position, out=out)
+
+
+register_scale_type(["C", "D", "c", "d"], "C or D, Base scale", _identity)
+register_scale_type(["A", "B", "a", "b"], "A or B, Squares scale", _square_root)
+register_scale_type(["K", "k"], "K, Cubes scale", _cube_root)
+register_scale_type(["ST", "S,T", "S&T", "st", "s,t", "s&t"], "ST or S,T or S&T, Small sines and tangents scale",
+                    _radians, factor="after")
+register_scale_type(["S", "s"], "S, Sine scale", _sine, factor="after")
+register_scale_type(["T", "t"], "T, Tangent scale", _tangent, factor="after")
+register_scale_type(["P", "p"], "P, Pythagorean scale", _pythagorean, factor="after")
+register_scale_type(["L", "Lg", "M", "l", "lg", "m"], "L or Lg or M, Linear or logarithmic or mantissa scale", _power)
+register_scale_type(["LL", "ll"], "LL, Log-log scale", _natural_log, factor="after")
+register_scale_type(["Sh", "SH", "sh"], "Sh, Hyperbolic sine scale", _hyperbolic_sine, factor="after")
+register_scale_type(["Th", "TH", "th"], "Th, Hyperbolic tangent scale", _hyperbolic_tangent, factor="after")
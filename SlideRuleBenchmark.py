@@ -0,0 +1,332 @@
+from BuildCache import digest
+from SlideRuleProject import read_manifest
+from SlideRuleScale import SlideRuleScale
+import decimal
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Benchmarks the stages of building scales (import, scale type setting and drawing), on synthetic scales of
+# configurable size and on the Example and VisualExample scales, which are kept as fixed baselines.
+# Results are written to a json file, so that they can be compared between versions.
+# The positions and svg files of the baselines are also checked against references.json, so that changes to the
+# outputs are never unnoticed.
+
+# Stages of a benchmark case, in the order they are run
+STAGES = ["import", "set_scale_type", "draw_straight", "draw_circular"]
+
+# Synthetic scales of the default suite: name and parameters of write_synthetic_specs
+SYNTHETIC_SUITE = [
+    ("synthetic-small", {"sectors": 9, "mold_rows": 3, "fineness": 1, "one_offs": 10}),
+    ("synthetic-medium", {"sectors": 9, "mold_rows": 3, "fineness": 2, "one_offs": 100}),
+    ("synthetic-large", {"sectors": 18, "mold_rows": 4, "fineness": 2, "one_offs": 1000})
+]
+
+# Budget for importing the SlideRuleScale module (s), and modules it must not import by itself
+IMPORT_TIME_BUDGET = 0.3
+DEFERRED_MODULES = ["pandas", "svgwrite"]
+
+# References of the positions and svg files of the baselines, next to this file
+REFERENCES_FILE = "references.json"
+# Sector of the fine interval check: core positions and an interval finer than the 5 decimals of names
+FINE_SECTOR = ("1", "1.001", "0.000005")
+
+_SPEC_COLUMNS = "l_position_tip,l_position_base,l_width,t_font,t_size,t_anchor,t_position_x,t_position_y,t_angle"
+_TEXT = "sans-serif,1.4,start,0,-0.8,90"
+
+
+# Writes the specs of a synthetic C scale to specs_dir, and returns its benchmark case.
+# The core has sectors + 1 positions, from sectors to 10 * sectors in steps of 9, so that the scale goes from 1 to 10
+# once positioned. Each sector has 9 * 10 ^ fineness positions:
+# - sectors: number of core sectors (x-y.csv files)
+# - mold_rows: number of rows of each x-y.csv file. Intervals go from 1 (first row) to 10 ^ -fineness (last row)
+# - fineness: number of decimal places of the finest interval
+# - one_offs: number of one-offs, spread over the scale. Every other one replaces a generated position
+def write_synthetic_specs(specs_dir, sectors=9, mold_rows=3, fineness=2, one_offs=10):
+    scale_dir = os.path.join(specs_dir, "scale", "")
+    os.makedirs(scale_dir, exist_ok=True)
+    core = [sectors + 9 * i for i in range(sectors + 1)]
+
+    with open(scale_dir + "Core.csv", "w") as file:
+        file.write("name," + _SPEC_COLUMNS + "\n")
+        for name in core:
+            file.write(str(name) + ",9,0,0.2," + _TEXT + "\n")
+
+    # Interval exponents go evenly from 0 to fineness, so that all intervals are powers of 10
+    exponents = [round(fineness * row / max(mold_rows - 1, 1)) for row in range(mold_rows)]
+    for lower, upper in zip(core[:-1], core[1:]):
+        with open(scale_dir + str(lower) + "-" + str(upper) + ".csv", "w") as file:
+            file.write("interval," + _SPEC_COLUMNS + "\n")
+            for row, exponent in enumerate(exponents):
+                text = _TEXT if row == 0 else ",,,,,"
+                file.write(format(10.0 ** -exponent, "." + str(exponent) + "f") + "," +
+                           str(7 - 3 * row / max(mold_rows - 1, 1)) + ",0,0.1," + text + "\n")
+
+    with open(scale_dir + "one-offs.csv", "w") as file:
+        file.write("name,position," + _SPEC_COLUMNS + "\n")
+        for i, position in enumerate(np.linspace(core[0], core[-1], one_offs + 2)[1:-1]):
+            # Every other one-off has the name of a generated position (whole numbers are always generated)
+            name = str(round(position)) if i % 2 else "o" + str(i)
+            position = round(position) if i % 2 else position
+            file.write(name + "," + repr(float(position)) + ",12,6,0.2,monospace,1.4,start,0,-0.8,90\n")
+
+    with open(os.path.join(specs_dir, "draw_straight.csv"), "w") as file:
+        file.write("paper_size_x,paper_size_y,scale_size_x,scale_origin_x,scale_origin_y,mark_origin_y,line_width,"
+                   "strip_zeros\n3400,40,3000,200,10,13,0.2,0\n")
+    with open(os.path.join(specs_dir, "draw_circular.csv"), "w") as file:
+        file.write("paper_size,limit_radius,scale_radius,mark_radius,centermark_size,line_width,strip_zeros\n"
+                   "1400,700,500,530,10,0.2,0\n")
+
+    return {"scale_specs_dir": scale_dir, "scale_type": "c", "invert_scale": False,
+            "positioning_factor": 1 / sectors, "log_base": 10,
+            "draw_straight": os.path.join(specs_dir, "draw_straight.csv"),
+            "draw_circular": os.path.join(specs_dir, "draw_circular.csv")}
+
+
+# Gets the benchmark cases of the fixed baselines: the Example scale and each scale of the VisualExample project.
+# repository_dir is the folder of this file
+def baseline_cases(repository_dir=os.path.dirname(os.path.abspath(__file__))):
+    example_dir = os.path.join(repository_dir, "Example", "specs", "")
+    cases = [("Example", {"scale_specs_dir": example_dir + "scale/", "scale_type": "c", "invert_scale": False,
+                          "positioning_factor": 0.01, "log_base": 10,
+                          "draw_straight": example_dir + "draw_straight.csv",
+                          "draw_circular": example_dir + "draw_circular.csv"})]
+    for job in read_manifest(os.path.join(repository_dir, "VisualExample", "project.csv")):
+        case = {key: job[key] for key in ["scale_specs_dir", "scale_type", "invert_scale",
+                                          "positioning_factor", "log_base"]}
+        case["draw_" + job["draw"]] = job["draw_specs"]
+        cases.append(("VisualExample/" + job["name"], case))
+    return cases
+
+
+# Writes the specs of a scale with a single sector, with an interval finer than the 5 decimals of names (FINE_SECTOR),
+# to specs_dir, and returns its case, in the same way as write_synthetic_specs
+def write_fine_specs(specs_dir):
+    case = write_synthetic_specs(specs_dir, sectors=1, mold_rows=1, fineness=0, one_offs=0)
+    lower, upper, interval = FINE_SECTOR
+    os.remove(case["scale_specs_dir"] + "1-10.csv")
+    with open(case["scale_specs_dir"] + "Core.csv", "w") as file:
+        file.write("name," + _SPEC_COLUMNS + "\n" +
+                   lower + ",9,0,0.2," + _TEXT + "\n" + upper + ",9,0,0.2," + _TEXT + "\n")
+    with open(case["scale_specs_dir"] + lower + "-" + upper + ".csv", "w") as file:
+        file.write("interval," + _SPEC_COLUMNS + "\n" + interval + ",5,0,0.1," + _TEXT + "\n")
+    return dict(case, positioning_factor=1)
+
+
+# Gets the digests of the outputs of each baseline and of the fine interval scale: base positions and names, positions
+# once the scale type is set, and the svg files drawn with the "stream" backend
+def reference_digests(repository_dir=os.path.dirname(os.path.abspath(__file__))):
+    digests = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, case in baseline_cases(repository_dir) + [("Fine", write_fine_specs(temp_dir))]:
+            scale = SlideRuleScale(case["scale_specs_dir"])
+            case_digests = {"base_positions": digest(scale.base_spec["position"].tobytes(),
+                                                     *scale.base_spec.names())}
+            scale.set_scale_type(case["scale_type"], invert_scale=case["invert_scale"],
+                                 positioning_factor=case["positioning_factor"], log_base=case["log_base"])
+            case_digests["positions"] = digest(scale.scale_spec["position"].tobytes())
+            for stage in ["draw_straight", "draw_circular"]:
+                if stage in case:
+                    output = io.StringIO()
+                    getattr(scale, stage)(output, case[stage], backend="stream")
+                    case_digests[stage] = digest(output.getvalue())
+            digests[name] = case_digests
+    return digests
+
+
+# Writes the current digests as the references. Only to be run when the outputs are meant to change
+def write_references(repository_dir=os.path.dirname(os.path.abspath(__file__))):
+    with open(os.path.join(repository_dir, REFERENCES_FILE), "w") as file:
+        json.dump(reference_digests(repository_dir), file, indent=2, sort_keys=True)
+
+
+# Checks the outputs of the baselines against the references, and the positions of the fine interval sector against
+# positions calculated one at a time with exact decimals. Returns the differences found
+def check_references(repository_dir=os.path.dirname(os.path.abspath(__file__))):
+    differences = []
+    with open(os.path.join(repository_dir, REFERENCES_FILE)) as file:
+        references = json.load(file)
+    digests = reference_digests(repository_dir)
+    for name in sorted(references.keys() | digests.keys()):
+        for output in sorted(references.get(name, {}).keys() | digests.get(name, {}).keys()):
+            if references.get(name, {}).get(output) != digests.get(name, {}).get(output):
+                differences.append(name + ": " + output + " is different from the reference")
+
+    # Names keep the first position with each name: the core positions, and then the sector, from lower to upper
+    lower, upper, interval = [decimal.Decimal(number) for number in FINE_SECTOR]
+    positions = [lower, upper] + [lower + interval * i for i in range(1, int((upper - lower) / interval))]
+    expected = {}
+    for position in positions:
+        expected.setdefault(("%.5f" % float(position)).rstrip("0").rstrip("."), float(position))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base_spec = SlideRuleScale(write_fine_specs(temp_dir)["scale_specs_dir"]).base_spec
+    generated = dict(zip(base_spec.names(), base_spec["position"].tolist()))
+    if len(generated) != len(base_spec) or generated != expected:
+        differences.append("Fine: " + str(len(base_spec)) + " positions with " + str(len(generated)) + " names, " +
+                           "instead of " + str(len(expected)) + " exact positions with one name each")
+    return differences
+
+
+# Runs the stages of a benchmark case repeat times, in a fresh scale each time. Outputs are drawn in output_dir.
+# Returns the number of positions, and the best time (s) and peak memory (bytes) of each stage.
+# Peak memory is measured with tracemalloc on a separate run, so that it does not slow down the timed runs
+def benchmark_case(case, output_dir, repeat=3, backend="svgwrite", merge_lines=False):
+    times = {}
+    for run in range(repeat + 1):
+        measure_memory = run == repeat
+        if measure_memory:
+            tracemalloc.start()
+        try:
+            for stage, elapsed, peak_memory, scale in _run_stages(case, output_dir, backend, merge_lines,
+                                                                  measure_memory):
+                if measure_memory:
+                    times[stage]["peak_memory"] = peak_memory
+                else:
+                    best = times.setdefault(stage, {"time": elapsed})
+                    best["time"] = min(best["time"], elapsed)
+        finally:
+            if measure_memory:
+                tracemalloc.stop()
+    return {"positions": len(scale.scale_spec), "stages": times}
+
+
+# Runs the stages of a benchmark case, yielding the stage, its time, its peak memory (if measured) and the scale
+def _run_stages(case, output_dir, backend, merge_lines, measure_memory):
+    scale = None
+    for stage in STAGES:
+        if stage.startswith("draw_") and stage not in case:
+            continue
+        if measure_memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        if stage == "import":
+            scale = SlideRuleScale(case["scale_specs_dir"])
+        elif stage == "set_scale_type":
+            scale.set_scale_type(case["scale_type"], invert_scale=case["invert_scale"],
+                                 positioning_factor=case["positioning_factor"], log_base=case["log_base"])
+        else:
+            getattr(scale, stage)(os.path.join(output_dir, stage + ".svg"), case[stage],
+                                  backend=backend, merge_lines=merge_lines)
+        elapsed = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] - start_memory if measure_memory else None
+        yield stage, elapsed, peak_memory, scale
+
+
+# Measures the time of importing the SlideRuleScale module, in a new interpreter each time so that nothing is already
+# imported. Returns the best time (s) of repeat imports, and which of DEFERRED_MODULES were imported with it
+def measure_import_time(repeat=5):
+    code = ("import sys, time\n"
+            "start = time.perf_counter()\n"
+            "from SlideRuleScale import SlideRuleScale\n"
+            "print(time.perf_counter() - start)\n"
+            "print(','.join(module for module in " + repr(DEFERRED_MODULES) + " if module in sys.modules))\n")
+    times = []
+    for run in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.split("\n")
+        times.append(float(output[0]))
+    imported = [module for module in output[1].split(",") if module]
+    return {"time": min(times), "budget": IMPORT_TIME_BUDGET, "imported_deferred_modules": imported,
+            "ok": min(times) <= IMPORT_TIME_BUDGET and not imported}
+
+
+# Runs the benchmark suite: the synthetic scales and the baselines. Returns the results, ready to be saved as json.
+# - synthetic_suite: list of names and parameters of write_synthetic_specs
+# - baselines: whether the Example and VisualExample scales should be included
+def run_benchmarks(synthetic_suite=SYNTHETIC_SUITE, baselines=True, repeat=3, backend="svgwrite", merge_lines=False):
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "backend": backend,
+        "merge_lines": merge_lines,
+        "repeat": repeat,
+        "module_import": measure_import_time(),
+        "reference_differences": check_references() if baselines else [],
+        "cases": {}
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cases = []
+        for name, parameters in synthetic_suite:
+            case = write_synthetic_specs(os.path.join(temp_dir, name), **parameters)
+            cases.append((name, dict(case, parameters=parameters)))
+        if baselines:
+            cases += baseline_cases()
+
+        for name, case in cases:
+            print("Benchmarking " + name + " ...")
+            result = benchmark_case(case, temp_dir, repeat=repeat, backend=backend, merge_lines=merge_lines)
+            if "parameters" in case:
+                result["parameters"] = case["parameters"]
+            results["cases"][name] = result
+    return results
+
+
+# Prints the results as a table, with the time and peak memory of each stage of each case
+def print_results(results):
+    module_import = results["module_import"]
+    print("\nModule import: {:.3f} s (budget {:.3f} s)".format(module_import["time"], module_import["budget"]) +
+          "".join(", imports " + module for module in module_import["imported_deferred_modules"]) +
+          ("" if module_import["ok"] else " - OVER BUDGET"))
+    print("References: " + ("OK" if not results["reference_differences"] else "DIFFERENT"))
+    for difference in results["reference_differences"]:
+        print(" -" + difference)
+    print("\n{:<26} {:>9} {:<15} {:>10} {:>12}".format("Case", "Positions", "Stage", "Time (s)", "Memory (kB)"))
+    for name, result in results["cases"].items():
+        for stage, measures in result["stages"].items():
+            print("{:<26} {:>9} {:<15} {:>10.4f} {:>12.0f}".format(
+                name, result["positions"], stage, measures["time"], measures["peak_memory"] / 1000))
+
+
+# Compares results with baseline results (from another version). Prints the ratio of each time and peak memory, and
+# returns the regressions: stages whose time or peak memory grew by more than threshold (0.5 = 50%).
+# Times under min_time (s) are too noisy to be compared, and are never regressions
+def compare_results(baseline, results, threshold=0.5, min_time=0.01):
+    print("\n{:<26} {:<15} {:>10} {:>10}".format("Case", "Stage", "Time", "Memory"))
+    regressions = []
+    for name, result in results["cases"].items():
+        if name not in baseline["cases"]:
+            continue
+        for stage, measures in result["stages"].items():
+            baseline_measures = baseline["cases"][name]["stages"].get(stage)
+            if baseline_measures is None:
+                continue
+            ratios = {}
+            for measure in ["time", "peak_memory"]:
+                ratios[measure] = measures[measure] / max(baseline_measures[measure], 1e-9)
+                if measure == "time" and max(measures["time"], baseline_measures["time"]) < min_time:
+                    continue
+                if ratios[measure] > 1 + threshold:
+                    regressions.append((name, stage, measure, ratios[measure]))
+            print("{:<26} {:<15} {:>9.2f}x {:>9.2f}x".format(name, stage, ratios["time"], ratios["peak_memory"]))
+    for name, stage, measure, ratio in regressions:
+        print(" -Regression: " + name + ", " + stage + ", " + measure + " x{:.2f}".format(ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python SlideRuleBenchmark.py results.json [baseline_results.json]")
+    # Off scale warnings of the baselines would be repeated on every run
+    logging.basicConfig(level=logging.ERROR)
+    benchmark_results = run_benchmarks()
+    print_results(benchmark_results)
+    with open(sys.argv[1], "w") as results_file:
+        json.dump(benchmark_results, results_file, indent=2)
+    if not benchmark_results["module_import"]["ok"] or benchmark_results["reference_differences"]:
+        sys.exit(1)
+    if len(sys.argv) == 3:
+        with open(sys.argv[2]) as baseline_file:
+            if compare_results(json.load(baseline_file), benchmark_results):
+                sys.exit(1)
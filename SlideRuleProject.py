@@ -0,0 +1,216 @@
+from BuildCache import BuildCache
+from SlideRuleScale import SlideRuleScale, read_draw_specs
+from SlideRuleSheet import SlideRuleSheet
+import concurrent.futures
+import io
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# Builds every scale of a slide rule project concurrently, across a pool of processes.
+# The project manifest is a csv file with one row per scale output, with the following columns:
+# - name: name of the scale, used in the summary
+# - description: (optional) description of the scale
+# - scale_specs_dir: directory of the scale specs (Core.csv, x-y.csv and one-offs.csv), or a compiled spec file
+# - scale_type, invert_scale, positioning_factor, log_base: parameters of set_scale_type. Blank cells use the defaults
+# - draw: "straight" or "circular"
+# - layout_labels: (optional) whether overlapping labels should be hidden before drawing (1 or 0)
+# - draw_specs: draw specs file
+# - output: svg file that is created
+# Paths are relative to the folder of the manifest.
+# - processes: number of processes. Defaults to the number of CPUs. With 1 process, scales are built one at a time
+# - backend, merge_lines, css_classes, group_styles: svg backend options of draw_straight and draw_circular
+# - cache_dir: (optional) folder of a BuildCache shared by all scales, so that unchanged sectors and svg files are
+#              reused
+# Returns the summary of the build: a list with a dictionary for each scale, with its status, number of positions
+# and the time taken by each stage
+def build_project(manifest, processes=None, backend="svgwrite", merge_lines=False, cache_dir=None, css_classes=False,
+                  group_styles=False):
+
+    print("\nBuilding project " + str(manifest) + " ...")
+
+    jobs = read_manifest(manifest)
+    for job in jobs:
+        job["backend"] = backend
+        job["merge_lines"] = merge_lines
+        job["css_classes"] = css_classes
+        job["group_styles"] = group_styles
+        job["cache_dir"] = cache_dir
+
+    start = time.perf_counter()
+    if processes == 1:
+        summary = [build_scale(job) for job in jobs]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            summary = list(executor.map(build_scale, jobs))
+    total_time = time.perf_counter() - start
+
+    print_summary(summary, total_time)
+    return summary
+
+
+# Reads the project manifest, with paths made relative to the current folder, as a list of dictionaries. Scale specs
+# directories always end with a separator, as SlideRuleScale expects
+def read_manifest(manifest):
+    project_dir = os.path.dirname(os.path.abspath(manifest))
+    rows = pd.read_csv(manifest, dtype=str, keep_default_na=False, skipinitialspace=True).to_dict("records")
+
+    jobs = []
+    for row in rows:
+        if row["draw"] not in ["straight", "circular"]:
+            raise ValueError("Unknown draw for scale '" + row["name"] + "': '" + row["draw"] + "'")
+        scale_specs_dir = os.path.join(project_dir, row["scale_specs_dir"])
+        if os.path.isdir(scale_specs_dir):
+            scale_specs_dir = os.path.join(scale_specs_dir, "")
+        jobs.append({
+            "name": row["name"],
+            "scale_specs_dir": scale_specs_dir,
+            "scale_type": row["scale_type"],
+            "invert_scale": row.get("invert_scale", "").strip().lower() in ["1", "true", "yes"],
+            "positioning_factor": float(row.get("positioning_factor") or 1),
+            "log_base": float(row.get("log_base") or 10),
+            "draw": row["draw"],
+            "layout_labels": row.get("layout_labels", "").strip().lower() in ["1", "true", "yes"],
+            "draw_specs": os.path.join(project_dir, row["draw_specs"]),
+            "output": os.path.join(project_dir, row["output"])
+        })
+    return jobs
+
+
+# Imports the scale of a project job, from its scale specs directory or compiled spec file
+def load_scale(job, cache=None, instrumentation=None):
+    if os.path.isfile(job["scale_specs_dir"]):
+        return SlideRuleScale.from_compiled(job["scale_specs_dir"], cache=cache, instrumentation=instrumentation)
+    return SlideRuleScale(job["scale_specs_dir"], cache=cache, instrumentation=instrumentation)
+
+
+# Composes scales of a project into a single svg sheet (see SlideRuleSheet), instead of an svg file for each one.
+# Circular scales are concentric, at the center of the sheet, with a single center mark. Straight scales are placed one
+# under the other, from the top of the sheet. The sheet is as large as the papers of the draw specs.
+# - names: (optional) names of the scales of the project to compose. All of them by default
+# - merge_lines, group_styles: options of SlideRuleSheet.draw
+def compose_sheet(manifest, output, names=None, merge_lines=False, group_styles=False):
+
+    logger.info("Composing sheet " + str(output) + " ...")
+
+    jobs = [job for job in read_manifest(manifest) if names is None or job["name"] in names]
+    draw_specs = [read_draw_specs(job["draw_specs"]) for job in jobs]
+
+    # Sheet size, and the origin of each straight scale
+    width = height = stacked_height = 0
+    origins = []
+    for job, specs in zip(jobs, draw_specs):
+        if job["draw"] == "circular":
+            width = max(width, specs["paper_size"])
+            height = max(height, specs["paper_size"])
+        else:
+            origins.append((0, stacked_height))
+            stacked_height += specs["paper_size_y"]
+            width = max(width, specs["paper_size_x"])
+            height = max(height, stacked_height)
+
+    start = time.perf_counter()
+    sheet = SlideRuleSheet(width, height)
+    scales = {}
+    center_mark = True
+    for job, specs in zip(jobs, draw_specs):
+        # Scales from the same specs are imported once
+        if job["scale_specs_dir"] not in scales:
+            scales[job["scale_specs_dir"]] = load_scale(job)
+        scale = scales[job["scale_specs_dir"]]
+        scale.set_scale_type(job["scale_type"], invert_scale=job["invert_scale"],
+                             positioning_factor=job["positioning_factor"], log_base=job["log_base"])
+        if job["layout_labels"]:
+            scale.layout_labels(job["draw"], specs)
+        if job["draw"] == "circular":
+            sheet.add_circular(scale, specs, name=job["name"], center_mark=center_mark)
+            center_mark = False
+        else:
+            sheet.add_straight(scale, specs, origin=origins.pop(0), name=job["name"])
+    sheet.draw(output, merge_lines=merge_lines, group_styles=group_styles)
+
+    logger.info(" -" + str(len(jobs)) + " scales composed in {:.3f} s".format(time.perf_counter() - start))
+    return sheet
+
+
+# Builds one scale of the project, timing each stage. Runs in a worker process, so log messages are kept in the summary,
+# together with the instrumentation events of the scale (see SlideRuleScale) and its off scale warnings
+def build_scale(job):
+    result = {"name": job["name"], "output": job["output"], "status": "ok", "positions": None,
+              "import_time": None, "set_time": None, "draw_time": None, "total_time": None,
+              "off_scale_warnings": [], "events": []}
+
+    # Log messages of the scale are only kept in the summary, instead of being mixed with the other scales
+    log = io.StringIO()
+    handler = logging.StreamHandler(log)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    scale_logger = logging.getLogger("SlideRuleScale")
+    level, propagate = scale_logger.level, scale_logger.propagate
+    scale_logger.addHandler(handler)
+    scale_logger.setLevel(logging.INFO)
+    scale_logger.propagate = False
+
+    start = time.perf_counter()
+    try:
+        stage_start = time.perf_counter()
+        cache = None if job["cache_dir"] is None else BuildCache(job["cache_dir"])
+        scale = load_scale(job, cache=cache, instrumentation=result["events"].append)
+        result["import_time"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        scale.set_scale_type(job["scale_type"], invert_scale=job["invert_scale"],
+                             positioning_factor=job["positioning_factor"], log_base=job["log_base"])
+        result["set_time"] = time.perf_counter() - stage_start
+        result["positions"] = len(scale.scale_spec)
+        result["off_scale_warnings"] = scale.off_scale_warnings
+
+        stage_start = time.perf_counter()
+        if job["layout_labels"]:
+            scale.layout_labels(job["draw"], job["draw_specs"])
+        draw = scale.draw_straight if job["draw"] == "straight" else scale.draw_circular
+        draw(job["output"], job["draw_specs"], backend=job["backend"], merge_lines=job["merge_lines"],
+             css_classes=job["css_classes"], group_styles=job["group_styles"])
+        result["draw_time"] = time.perf_counter() - stage_start
+    except Exception as error:
+        result["status"] = "error: " + type(error).__name__ + ": " + str(error)
+    finally:
+        scale_logger.removeHandler(handler)
+        scale_logger.setLevel(level)
+        scale_logger.propagate = propagate
+    result["total_time"] = time.perf_counter() - start
+    result["log"] = log.getvalue()
+
+    return result
+
+
+# Prints the build summary as a table, with the time taken by each stage of each scale
+def print_summary(summary, total_time):
+    print("\n{:<16} {:>9} {:>10} {:>8} {:>8} {:>9}  {}".format(
+        "Scale", "Positions", "Import (s)", "Set (s)", "Draw (s)", "Total (s)", "Status"))
+    for result in summary:
+        print("{:<16} {:>9} {:>10} {:>8} {:>8} {:>9}  {}".format(
+            result["name"],
+            "-" if result["positions"] is None else result["positions"],
+            *["-" if result[key] is None else "{:.3f}".format(result[key])
+              for key in ["import_time", "set_time", "draw_time", "total_time"]],
+            result["status"]))
+    for result in summary:
+        for warning in result["off_scale_warnings"]:
+            print(" -" + result["name"] + ": unexpected " + warning["bound"] + " bound of value " + warning["name"] +
+                  ", located " + warning["location"] + " by " + str(warning["distance"]))
+    failed = sum(result["status"] != "ok" for result in summary)
+    print("\n" + str(len(summary)) + " scales built in {:.3f} s".format(total_time) +
+          (" (" + str(failed) + " failed)" if failed else ""))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python SlideRuleProject.py manifest.csv [processes] [cache_dir]")
+    build_project(sys.argv[1], processes=int(sys.argv[2]) if len(sys.argv) >= 3 else None,
+                  cache_dir=sys.argv[3] if len(sys.argv) == 4 else None)
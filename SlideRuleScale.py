@@ -1,85 +1,311 @@
-import numpy as np
-import pandas as pd
-import svgwrite as sw
+import csv
+import decimal
+import io
+import logging
+import os
+import sys
+import time
+import tracemalloc
 
+import numpy as np
 
+from BuildCache import digest
+from LabelLayout import LabelLayout
+from RasterPreview import RasterPreview
+from ScaleTypes import get_scale_type
+from SvgStream import SvgStream
+from TickTable import TickTable
+
+# pandas and svgwrite are only imported by the stages that need them (reading spec files and drawing with the svgwrite
+# backend), so that importing this module, loading compiled specs and drawing with the stream backend stay fast
+logger = logging.getLogger(__name__)
+
+
+# Number of decimals of names
+NAME_DECIMALS = 5
+
+
+# Formats positions as names: 5 digit approximation of position, with no trailing zeros or point
+def _format_names(positions):
+    return [("%.5f" % position).rstrip("0").rstrip(".") for position in positions]
+
+
+# Gets the keys of names (as formatted by _format_names), as integers (1.25 as 125000). Names with the same key are the
+# same. Keys are read from the text of the names, which have at most 5 decimals, so they round the same way as names
+def _name_keys(names):
+    return np.rint(np.asarray(names, dtype=float) * 10 ** NAME_DECIMALS).astype(np.int64)
+
+
+# Reads a decimal number written as text (such as "0.25" or "1e-3") as an integer and its number of decimals (25 and 2)
+def _decimal_grid(text):
+    try:
+        number = decimal.Decimal(str(text).strip())
+    except decimal.InvalidOperation:
+        raise ValueError("Invalid number: '" + str(text) + "'") from None
+    if not number.is_finite():
+        raise ValueError("Invalid number: '" + str(text) + "'")
+    decimals = max(-number.as_tuple().exponent, 0)
+    return int(number.scaleb(decimals)), decimals
+
+
+# Generates all positions of a mold row, from lower bound plus interval, with step of size interval, until upper bound.
+# Bounds and interval are decimal numbers written as text. They are scaled to integers by a common power of ten, so that
+# every position is an exact multiple of the interval on the integer grid, and is only converted to the nearest float
+# at the end. Adding the interval step by step in floating point would drift, and fine sectors could miss or repeat the
+# positions near their upper bound
+def _mold_positions(lower_bound, upper_bound, interval):
+    (lower, lower_decimals), (upper, upper_decimals), (step, step_decimals) = [
+        _decimal_grid(number) for number in [lower_bound, upper_bound, interval]]
+    if not step > 0:
+        raise ValueError("Invalid interval: '" + str(interval) + "'. Intervals must be positive")
+    decimals = max(lower_decimals, upper_decimals, step_decimals)
+    lower *= 10 ** (decimals - lower_decimals)
+    upper *= 10 ** (decimals - upper_decimals)
+    step *= 10 ** (decimals - step_decimals)
+    # Positions lower + step * i, for i from 1, that are under upper
+    count = max((upper - lower - 1) // step, 0)
+    if max(abs(lower), abs(upper)) < 2 ** 53 and decimals <= 22:
+        # Both the integers and the power of ten are exact as floats, so the division gives the nearest float
+        positions = lower + step * np.arange(1, count + 1, dtype=np.int64)
+        return positions / float(10 ** decimals)
+    # Grids too large for exact float division (about 16 significant digits) are generated one position at a time
+    return np.array([(lower + step * i) / 10 ** decimals for i in range(1, count + 1)], dtype=float)
+
+
+# Generates the positions of a sector, with bounds [lower, upper], from its mold data. Returns a tick table with the
+# positions of each row of the mold, from first to last, possibly with repeated names
+def _generate_sector(bound, spec_molds):
+    blocks = []
+    # Works mold data to obtain the numbers of the whole sector at once for each row of the mold
+    # Iterates over each row of the mold, from first to last
+    for i, spec_mold in spec_molds.iterrows():
+        positions = _mold_positions(bound[0], bound[1], spec_mold["interval"])
+        # Every position of the row shares the same representation
+        columns = spec_mold.to_dict()
+        columns.update(name=_format_names(positions), position=positions)
+        blocks.append(TickTable.from_columns(columns, len(positions)))
+    return TickTable.concatenate(blocks)
+
+
+# Reads a file as bytes. Returns None if the file does not exist
+def _read_spec_file(filename):
+    try:
+        with open(filename, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        logger.warning("   FILE NOT FOUND: " + filename + "\n   Empty file is assumed.")
+        return None
+
+
+# Gets the indices of the first occurrence of each key, in their original order
+def _first_unique(keys):
+    return np.sort(np.unique(np.asarray(keys), return_index=True)[1])
+
+
+# Gets the indices of the last occurrence of each key, in their original order
+def _last_unique(keys):
+    keys = np.asarray(keys)
+    return np.sort(len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1])
+
+
+# Reads the draw specs from a csv file, as a dictionary with the values of its first row as floats (NaN when blank).
+# Draw specs that were already read (such as a dictionary) are kept as they are
+def read_draw_specs(draw_specs):
+    if isinstance(draw_specs, (str, os.PathLike)):
+        with open(draw_specs, newline="", encoding="utf-8-sig") as file:
+            rows = csv.reader(file)
+            columns = [column.strip() for column in next(rows)]
+            values = next(rows)
+        return {column: float(value) if value.strip() else np.nan for column, value in zip(columns, values)}
+    return draw_specs
+
+
+# Gets the base and tip coordinates of each line, in the x or y direction, from the geometry arrays
+def _points(geometry, direction):
+    return zip(geometry[direction + "_base"].tolist(), geometry[direction + "_tip"].tolist())
+
+
+# Creates the svg drawing for the chosen backend. Both backends have the same drawing interface
+def _new_drawing(backend, merge_lines, **kwargs):
+    if backend == "svgwrite":
+        if merge_lines:
+            raise ValueError("Merged lines are only available with the 'stream' backend")
+        import svgwrite
+
+        return svgwrite.Drawing(**kwargs)
+    if backend == "stream":
+        return SvgStream(merge_lines=merge_lines, **kwargs)
+    raise ValueError("Unknown backend: '" + str(backend) + "'")
+
+
+# Progress messages are logged to the "SlideRuleScale" logger: stages at INFO level, sectors at DEBUG level, and off
+# scale positions and missing files at WARNING level
 class SlideRuleScale:
     # Initializes by importing spec/scale data. This data includes which numbers or constants are represented and how
-    def __init__(self, scale_specs_dir):
+    # - cache: (optional) BuildCache where the positions of each sector and the drawn svg files are reused from, as long
+    #          as their spec files did not change
+    # - instrumentation: (optional) function called with a dictionary for each event of the build. All events have
+    #                    "event" (its kind), "time" (s) and "memory" (bytes allocated while tracemalloc is tracing,
+    #                    None otherwise). Kinds of events and their other keys:
+    #                    - "import", "set_scale_type", "draw_straight", "draw_circular": when each stage ends, with
+    #                      "positions" (number of positions) and details of the stage
+    #                    - "sector": when each sector is imported, with "sector" ("x-y"), "positions" and "source"
+    #                      ("generated", "memory", "cache" or "missing")
+    #                    - "off_scale": for each off scale warning of set_scale_type, with its keys
+    # - compiled: (optional) compiled spec file (see compile) to load instead of the spec files of scale_specs_dir
+    def __init__(self, scale_specs_dir, cache=None, instrumentation=None, compiled=None):
+
+        self.scale_specs_dir = scale_specs_dir
+        self.cache = cache
+        self.instrumentation = instrumentation
+        self.compiled = compiled
+        # Positions of each sector, by fingerprint, kept to be reused when the specs are imported again
+        self.sectors = {}
+
+        self._import_specs()
+        self.scale_spec = self.base_spec
+
+        # Keeps track if scale was already set, and with which parameters
+        self.scale_set = False
+        self.scale_parameters = None
+        # Fingerprint of the scale type that is set (see ScaleTypes)
+        self.scale_type_fingerprint = None
+        # Positions and off scale warnings of each scale type (by serial) and set of parameters
+        self.scale_variants = {}
+        # Off scale warnings of the scale type that is set
+        self.off_scale_warnings = []
+        # Fingerprint of the label layout of the scale spec (see layout_labels). None while there is no layout
+        self.layout_fingerprint = None
+
+    # Initializes from a compiled spec file (see compile). The positions are memory mapped from the file, with no spec
+    # files to parse and no sectors to generate
+    @classmethod
+    def from_compiled(cls, filename, cache=None, instrumentation=None):
+        return cls(None, cache=cache, instrumentation=instrumentation, compiled=filename)
+
+    # Compiles the base scale spec into a single binary file, that is loaded much faster than the spec files
+    def compile(self, filename):
+        logger.info("Compiling scale spec to " + str(filename) + " ...")
+        self.base_spec.save_compiled(filename, {"fingerprint": self.fingerprint})
+
+    # Imports the spec files again, to update the scale after they are edited. Only the sectors whose files changed are
+    # generated again. If a scale type was set, it is set again with the same parameters.
+    # Returns whether the scale spec changed
+    def reload(self):
+        fingerprint = self.fingerprint
+        self._import_specs()
+        if self.fingerprint == fingerprint:
+            return False
+
+        self.scale_variants = {}
+        if self.scale_set:
+            self.set_scale_type(*self.scale_parameters)
+        else:
+            self.scale_spec = self.base_spec
+        return True
+
+    # Imports spec/scale data from the spec files into the base scale spec
+    def _import_specs(self):
+
+        if self.compiled is not None:
+            self._load_compiled()
+            return
+
+        import pandas as pd
 
-        print("\nImporting Scale Specs ...")
+        logger.info("Importing Scale Specs ...")
+        start = self._start_measure()
+
+        scale_specs_dir = self.scale_specs_dir
+        sectors = {}
 
         # Reads core data. This data includes the main positions, in which the pattern for number representation changes
         filename = scale_specs_dir + "Core.csv"
-        self.scale_spec = pd.read_csv(filename, dtype={"name": str})  # Reads name as string, not number
-        self.scale_spec.insert(0, "position", self.scale_spec["name"].astype(float))  # Adds position column, from name
-
-        # Get bounds and to conform name to the standard format
-        bounds = []  # Initialise bounds variable
-        prev_line = None  # Initialize auxiliary variable to get bounds
-        # Iterates over each initial line
-        for i, line in self.scale_spec.iterrows():
-            # Extracts and organizes the bounds for each different sector with different number representation molds
-            if i > 0:  # Extracts and organizes the bounds for each different sector
-                bounds.append([prev_line["name"], line["name"]])
-            prev_line = line
-            # Edit name to conform to the standard format
-            self.scale_spec.loc[i, "name"] = "{:.5f}".format(line["position"]).rstrip("0").rstrip(".")
-
-        # Sets name column as index
-        self.scale_spec.set_index("name", inplace=True)
+        with open(filename, "rb") as file:
+            core_data = file.read()
+        core = pd.read_csv(io.BytesIO(core_data), dtype={"name": str})  # Reads name as string, not number
+        # Fingerprints of the content of all spec files
+        fingerprints = [digest("core", core_data)]
+        core["position"] = core["name"].astype(float)  # Adds position column, from name
+
+        # Extracts and organizes the bounds for each different sector with different number representation molds
+        bounds = list(zip(core["name"][:-1], core["name"][1:]))
+        # Edits names to conform to the standard format
+        core["name"] = _format_names(core["position"].to_numpy())
+
+        # Every generated block is collected first and concatenated once. Core positions come first, so that they
+        # are always prioritized over generated positions with the same name
+        blocks = [TickTable.from_dataframe(core)]
 
         # Imports the data from each sector and works it to obtain positions and their respective representations
         # Iterates over each sector, represented by their bounds
         for bound in bounds:
-            print(" -Working from " + bound[0] + " to " + bound[1] + " ...")
+            logger.debug(" -Working from " + bound[0] + " to " + bound[1] + " ...")
+            sector_start = self._start_measure()
 
             # Reads mold data of sector from file name generated from bounds positions.
             # This data includes instructions on how to generate all represented numbers and how they should be shown
             filename = scale_specs_dir + bound[0] + "-" + bound[1] + ".csv"
-            try:
-                spec_molds = pd.read_csv(filename, dtype={"interval": str}).set_index("interval")
-            except FileNotFoundError:
-                print("   FILE NOT FOUND: " + filename + "\n   Empty file is assumed.")
-                spec_molds = pd.DataFrame()
-            # Works mold data to obtain the numbers and add them to self.scale_spec
-            # Iterates over each row of the mold, from first to last
-            for i, spec_mold in spec_molds.iterrows():
-                # Extracts the desired value for the interval between two numbers
-                # noinspection PyTypeChecker
-                interval = float(spec_mold.name)
-                # Sets first position of the sector defined by current row
-                spec_mold["position"] = float(bound[0]) + interval
-                # Sets name based on 5 digit approximation of position
-                spec_mold.rename("{:.5f}".format(spec_mold["position"]).rstrip("0").rstrip("."), inplace=True)
-                # Iterates over numbers until upper bound
-                while spec_mold["position"] < float(bound[1]):
-                    try:  # Only add number if it has not yet been added (PREFERENCE FOR FIRST ROWS OF MOLD)
-                        self.scale_spec = self.scale_spec.append(spec_mold, verify_integrity=True)
-                    except ValueError:  # If number has already been added, do nothing
-                        pass
-                    # Iterates position with step of size interval
-                    spec_mold["position"] = spec_mold["position"] + interval
-                    # Sets name based on 5 digit approximation of position
-                    spec_mold.rename("{:.5f}".format(spec_mold["position"]).rstrip("0").rstrip("."), inplace=True)
+            spec_data = _read_spec_file(filename)
+            if spec_data is None:
+                fingerprints.append(digest("missing sector", bound[0], bound[1]))
+                self._report("sector", sector_start, sector=bound[0] + "-" + bound[1], positions=0, source="missing")
+                continue
+            sector_fingerprint = digest("sector", bound[0], bound[1], spec_data)
+            fingerprints.append(sector_fingerprint)
+
+            # Reuses the positions of the sector if its file did not change. If not, generates them
+            source = "memory"
+            sector = self.sectors.get(sector_fingerprint)
+            if sector is None and self.cache is not None:
+                source = "cache"
+                sector_key = self.cache.key(sector_fingerprint)
+                sector = self.cache.load_table(sector_key)
+                if sector is not None:
+                    logger.debug("   Reused from cache")
+            if sector is None:
+                source = "generated"
+                sector = _generate_sector(bound, pd.read_csv(io.BytesIO(spec_data), dtype={"interval": str}))
+                if self.cache is not None:
+                    self.cache.save_table(sector_key, sector)
+            sectors[sector_fingerprint] = sector
+            blocks.append(sector)
+            self._report("sector", sector_start, sector=bound[0] + "-" + bound[1], positions=len(sector), source=source)
+        self.sectors = sectors
+
+        # Joins all blocks and only keeps the first occurrence of each name (PREFERENCE FOR FIRST ROWS OF MOLD).
+        # Names are compared by their integer keys, instead of as text
+        scale_spec = TickTable.concatenate(blocks)
+        scale_spec = scale_spec.take(_first_unique(_name_keys(scale_spec.names())))
 
         # Organises data, edits one-offs on data and reconfigures data
-        print(" -Editing one-offs & Post processing ...")
-        self.scale_spec.sort_values(by="position", inplace=True)  # Puts all numbers in order. Good for debugging
+        logger.info(" -Editing one-offs & Post processing ...")
+        scale_spec = scale_spec.take(np.argsort(scale_spec["position"], kind="stable"))  # Puts all numbers in order
         # One-offs are added after ordering so that they are always prioritized
         filename = scale_specs_dir + "one-offs.csv"
-        try:
-            spec_one_offs = pd.read_csv(filename, dtype={"name": str}).set_index("name")
-        except FileNotFoundError:
-            print("   FILE NOT FOUND: " + filename + "\n   Empty file is assumed.")
-            spec_one_offs = pd.DataFrame()
-        self.scale_spec = self.scale_spec.append(spec_one_offs)  # Appends one-offs.csv data
+        spec_data = _read_spec_file(filename)
+        if spec_data is not None:
+            spec_one_offs = pd.read_csv(io.BytesIO(spec_data), dtype={"name": str})
+            scale_spec = TickTable.concatenate([scale_spec, TickTable.from_dataframe(spec_one_offs)])
+        fingerprints.append(digest("one-offs", spec_data))
         # Deletes any line that was in the same position as any of the one-offs that were just added
-        self.scale_spec.drop_duplicates(subset="position", keep="last", inplace=True)
-        self.scale_spec.reset_index(inplace=True)  # Removes names from index, leaving empty index (auto index)
+        # The base scale spec is never changed. Scale types are set on views of it, with their own positions
+        self.base_spec = scale_spec.take(_last_unique(scale_spec["position"])).freeze()
 
-        # Keeps track if scale was already set
-        self.scale_set = False
+        # Fingerprint of the whole scale spec
+        self.fingerprint = digest(*fingerprints)
+        self._report("import", start, positions=len(self.base_spec), sectors=len(bounds))
+
+    # Loads the base scale spec from a compiled spec file
+    def _load_compiled(self):
+
+        logger.info("Loading compiled Scale Spec ...")
+        start = self._start_measure()
+
+        base_spec, metadata = TickTable.load_compiled(self.compiled)
+        self.base_spec = base_spec.freeze()
+        self.fingerprint = metadata["fingerprint"]
+        self._report("import", start, positions=len(self.base_spec), source="compiled")
 
     # Processes position values of scale_spec in accordance with:
     # - scale_type: scale types (Mannheim based)
@@ -87,120 +313,112 @@ class SlideRuleScale:
     # - positioning_factor: positions are multiplied by this number before log conversion. Usually the same as bounds[0]
     # - log_base: the base of the logarithm. Base 10 for the decimal number system
     # The position values of the main part of the scales go from 0 to 1
+    # The base scale spec is never changed, so the scale type can be set again, with other parameters, at any time.
+    # The positions of each set of parameters are kept, so that setting it again is immediate
     def set_scale_type(self, scale_type, invert_scale=False, positioning_factor=1, log_base=10):
 
-        # Checks if scale was already set. If so, stops. If not, marks as already set and continues
-        if self.scale_set:
-            print("\nUnable to set scale: Scale type already set !!!")
-            return
-        self.scale_set = True
-
-        print("\nSetting scale ...")
-
-        #  x | # -> log(#)
-        if scale_type in ["C", "D", "c", "d"]:
-            print(" -Scale: " + "C or D, Base scale")
-            # Repositions scale in accordance with positioning_factor - BEFORE transformation
-            self.scale_spec["position"] = self.scale_spec["position"] * positioning_factor
-            # Applies scales' transformation
-            # NO TRANSFORMATION - this is the base scale
-        #  x² | √# -> log(#)
-        elif scale_type in ["A", "B", "a", "b"]:
-            print(" -Scale: " + "A or B, Squares scale")
-            # Repositions scale in accordance with positioning_factor - BEFORE transformation
-            self.scale_spec["position"] = self.scale_spec["position"] * positioning_factor
-            # Applies scales' transformation (square root)
-            self.scale_spec["position"] = np.power(self.scale_spec["position"], 1./2)
-        #  x³ | ∛# -> log(#)
-        elif scale_type in ["K", "k"]:
-            print(" -Scale: " + "K, Cubes scale")
-            # Repositions scale in accordance with positioning_factor -  BEFORE transformation
-            self.scale_spec["position"] = self.scale_spec["position"] * positioning_factor
-            # Applies scales' transformation (cube root)
-            self.scale_spec["position"] = np.power(self.scale_spec["position"], 1./3)
-        # arcsin(x) or arctan(x) or deg(x rad) | rad(# deg) -> log(#)
-        elif scale_type in ["ST", "S,T", "S&T", "st", "s,t", "s&t"]:
-            print(" -Scale: " + "ST or S,T or S&T, Small sines and tangents scale")
-            # Applies scales' transformation (radian conversion)
-            self.scale_spec["position"] = np.radians(self.scale_spec["position"])
-            # Repositions scale in accordance with positioning_factor - AFTER transformation
-            self.scale_spec["position"] = self.scale_spec["position"] * positioning_factor
-        # arcsin(x) | sin(# deg) -> log(#)
-        elif scale_type in ["S", "s"]:
-            print(" -Scale: " + "S, Sine scale")
-            # Applies scales' transformation (sine of degrees, np.sin input is in radians)
-            self.scale_spec["position"] = np.sin(np.radians(self.scale_spec["position"]))
-            # Repositions scale in accordance with positioning_factor - AFTER transformation
-            self.scale_spec["position"] = self.scale_spec["position"] * positioning_factor
-        # arctan(x) | tan(# deg) -> log(#)
-        elif scale_type in ["T", "t"]:
-            print(" -Scale: " + "T, Tangent scale")
-            # Applies scales' transformation (tangent of degrees, np.tan input is in radians)
-            self.scale_spec["position"] = np.tan(np.radians(self.scale_spec["position"]))
-            # Repositions scale in accordance with positioning_factor - AFTER transformation
-            self.scale_spec["position"] = self.scale_spec["position"] * positioning_factor
-        # √(1-x²) | √(1-#²) -> log(#) | Used with right-angled triangles and to obtain cos from sin
-        elif scale_type in ["P", "p"]:
-            print(" -Scale: " + "P, Pythagorean scale")
-            # Applies scales' transformation (square root of one minus the number squared)
-            self.scale_spec["position"] = np.power(1 - np.power(self.scale_spec["position"], 2), 1./2)
-            # Repositions scale in accordance with positioning_factor - AFTER transformation
-            self.scale_spec["position"] = self.scale_spec["position"] * positioning_factor
-        # log(x) | log_base ^ (#) -> log(#)
-        elif scale_type in ["L", "Lg", "M", "l", "lg", "m"]:
-            print(" -Scale: " + "L or Lg or M, Linear or logarithmic or mantissa scale")
-            # Repositions scale in accordance with positioning_factor -  BEFORE transformation
-            self.scale_spec["position"] = self.scale_spec["position"] * positioning_factor
-            # Applies scales' transformation (log_base to the power of)
-            self.scale_spec["position"] = np.power(log_base, self.scale_spec["position"])
-        # Not programed scale
+        logger.info("Setting scale ...")
+        start = self._start_measure()
+
+        # Reuses the positions if the scale type was already set with the same parameters. If not, calculates them.
+        # Positions are kept by serial, so that a scale type that replaced another one under the same name (see
+        # register_scale_type) is calculated again
+        scale = get_scale_type(scale_type)
+        parameters = (scale_type, bool(invert_scale), positioning_factor, log_base)
+        variant = (scale.serial,) + parameters
+        reused = variant in self.scale_variants
+        if reused:
+            logger.info(" -Scale: " + scale_type + ", reused")
         else:
-            raise ValueError("Unknown scale type: '" + scale_type + "'")
+            self.scale_variants[variant] = self._transform_positions(*parameters)
+        position, off_scale_warnings = self.scale_variants[variant]
+
+        # The scale spec shares everything but the positions with the base scale spec
+        self.scale_spec = self.base_spec.with_position(position)
+        self.scale_set = True
+        self.layout_fingerprint = None
+        self.scale_parameters = parameters
+        self.scale_type_fingerprint = scale.fingerprint
+        self.off_scale_warnings = off_scale_warnings
 
-        # Applies log with base log_base, and rounds final result to avoid issues with bounds and coincidence checks
-        print(" -Log base: " + str(log_base))
-        self.scale_spec["position"] = round(np.log(self.scale_spec["position"]) / np.log(log_base), 10)
+        # Warns about off scale positions
+        for off_scale_warning in off_scale_warnings:
+            logger.warning(" -Unexpected " + off_scale_warning["bound"] + " bound\n"
+                           "   of value " + off_scale_warning["name"] + "\n"
+                           "   located " + off_scale_warning["location"] + " by " + str(off_scale_warning["distance"]))
+        if not off_scale_warnings:
+            logger.info(" -Bounds OK")
 
-        # Inverts scale if requested
+        self._report("set_scale_type", start, positions=len(position), scale_type=scale_type,
+                     invert_scale=bool(invert_scale), positioning_factor=positioning_factor, log_base=log_base,
+                     reused=reused, off_scale_warnings=len(off_scale_warnings))
+        for off_scale_warning in off_scale_warnings:
+            self._report("off_scale", None, scale_type=scale_type, **off_scale_warning)
+
+    # Calculates the positions of the base scale spec for a scale type, and checks them for off scale positions.
+    # Returns the positions (read only) and the off scale warnings. Each warning is a dictionary with the bound ("lower"
+    # or "upper"), the name and position of the position at that bound, its location ("under the minimum" or "over the
+    # maximum") and its distance to the limit it went past
+    def _transform_positions(self, scale_type, invert_scale, positioning_factor, log_base):
+
+        # Each scale type calculates all positions in a single buffer (see ScaleTypes)
+        scale = get_scale_type(scale_type)
+        logger.info(" -Scale: " + scale.description)
+        logger.info(" -Log base: " + str(log_base))
         if bool(invert_scale):
-            print(" -Inverted scale")
-            self.scale_spec["position"] = 1.0 - self.scale_spec["position"]
+            logger.info(" -Inverted scale")
+        position = scale.positions(self.base_spec["position"], invert_scale, positioning_factor, log_base)
 
         # Checks and warns about off scale positions
-        bounds_index = [np.argmin(self.scale_spec["position"]), np.argmax(self.scale_spec["position"])]
+        bounds_index = [np.argmin(position), np.argmax(position)]
+        names = self.base_spec.names()
         off_scale_warnings = []
 
-        if self.scale_spec["position"][bounds_index[0]] < 0:
-            off_scale_warnings.append(["lower", self.scale_spec["name"][bounds_index[0]],
-                                       "under the minimum", str(-self.scale_spec["position"][bounds_index[0]])])
-        elif self.scale_spec["position"][bounds_index[0]] > 1:
-            off_scale_warnings.append(["lower", self.scale_spec["name"][bounds_index[0]],
-                                       "over the maximum", str(self.scale_spec["position"][bounds_index[0]] - 1)])
-        if self.scale_spec["position"][bounds_index[1]] < 0:
-            off_scale_warnings.append(["upper", self.scale_spec["name"][bounds_index[1]],
-                                       "under the minimum", str(-self.scale_spec["position"][bounds_index[1]])])
-        elif self.scale_spec["position"][bounds_index[1]] > 1:
-            off_scale_warnings.append(["upper", self.scale_spec["name"][bounds_index[1]],
-                                       "over the maximum", str(self.scale_spec["position"][bounds_index[1]] - 1)])
-        for off_scale_warning in off_scale_warnings:
-            print(" -Unexpected " + off_scale_warning[0] + " bound")
-            print("   of value " + off_scale_warning[1])
-            print("   located " + off_scale_warning[2] + " by " + off_scale_warning[3])
+        for bound, index in zip(["lower", "upper"], bounds_index):
+            if position[index] < 0:
+                location, distance = "under the minimum", -position[index]
+            elif position[index] > 1:
+                location, distance = "over the maximum", position[index] - 1
+            else:
+                continue
+            off_scale_warnings.append({"bound": bound, "name": names[index], "position": float(position[index]),
+                                       "location": location, "distance": float(distance)})
 
-        if not off_scale_warnings:
-            print(" -Bounds OK")
+        position.flags.writeable = False
+        return position, off_scale_warnings
 
     # Draws a straight scale based on the scale spec and its draw specs
-    def draw_straight(self, output, draw_specs):
+    # - backend: "svgwrite" builds the whole svg before saving it, "stream" writes the svg as it is drawn
+    # - merge_lines: whether all lines should be drawn as a single path ("stream" backend only)
+    # - css_classes: whether line and text styles should be css classes, written once, instead of being repeated in
+    #                every element ("stream" backend only). The scale is drawn in a group, as in SlideRuleSheet
+    # - group_styles: whether the lines and texts of each style should be grouped, so that they don't need their own
+    #                 class (with css_classes only)
+    def draw_straight(self, output, draw_specs, backend="svgwrite", merge_lines=False, css_classes=False,
+                      group_styles=False):
 
         if not self.scale_set:
-            print("\nUnable to draw scale: scale type not set !!!")
+            logger.error("Unable to draw scale: scale type not set !!!")
             return
 
-        print("\nDrawing straight scale ...")
+        logger.info("Drawing straight scale ...")
+        start = self._start_measure()
+
+        # Reuses the svg if the scale and its draw specs did not change
+        drawing_key = self._drawing_key("straight", output, draw_specs, backend, merge_lines, css_classes, group_styles)
+        if drawing_key is not None and self.cache.load_file(drawing_key, output):
+            logger.info(" -Reused from cache")
+            self._report("draw_straight", start, positions=len(self.scale_spec), source="cache", backend=backend)
+            return
+
+        if css_classes or group_styles:
+            lines = self._draw_sheet("straight", output, read_draw_specs(draw_specs), backend, merge_lines, css_classes,
+                                     group_styles)
+            self._drawn("draw_straight", drawing_key, output, start, lines, backend)
+            return
 
         # Sets local variables from draw specs
-        draw_specs = pd.read_csv(draw_specs).loc[0]
+        draw_specs = read_draw_specs(draw_specs)
         paper_size_x = draw_specs["paper_size_x"]
         paper_size_y = draw_specs["paper_size_y"]
         scale_size_x = draw_specs["scale_size_x"]
@@ -211,7 +429,9 @@ class SlideRuleScale:
         strip_zeros = draw_specs["strip_zeros"]
 
         # Creates svg with appropriate dimensions and all units in mm
-        drawing = sw.Drawing(
+        drawing = _new_drawing(
+            backend,
+            merge_lines,
             filename=output,
             size=(str(paper_size_x) + "mm", str(paper_size_y) + "mm"),
             viewBox="0 0 " + str(paper_size_x) + " " + str(paper_size_y)
@@ -233,28 +453,29 @@ class SlideRuleScale:
             stroke="black"
         ))
 
-        # Iterates over each position in the created scale spec
-        for i, line in self.scale_spec.iterrows():
-            # Calculates x and y positions for base of line ([0]) and for tip of line ([1])
-            x = [scale_origin_x + line["position"] * scale_size_x, scale_origin_x + line["position"] * scale_size_x]
-            y = [scale_origin_y + line["l_position_base"], scale_origin_y + line["l_position_tip"]]
-            # Adds the line. Converts the y position from being measured from the bottom to being measured from the top
+        # Calculates the base and tip of all lines at once
+        geometry = self._geometry_straight(draw_specs)
+        lines = len(geometry["index"])
+
+        # Iterates over each position in the created scale spec, together with its base ([0]) and tip ([1])
+        for line, x, y in zip(self._lines(), _points(geometry, "x"), _points(geometry, "y")):
+            # Adds the line
             drawing.add(drawing.line(
-                start=(x[0], paper_size_y - y[0]),
-                end=(x[1], paper_size_y - y[1]),
+                start=(x[0], y[0]),
+                end=(x[1], y[1]),
                 stroke_width=line["l_width"],
                 stroke="black"
                 ))
 
-            # Checks if any text properties are NaN. If so, jumps text adding code. If not, executes text adding code
-            if line[line.index.str.startswith("t_")].isnull().values.any():
+            # Checks if any text properties are blank. If so, jumps text adding code. If not, executes text adding code
+            if not line["has_text"]:
                 continue
 
             # Strips the zeros from the name, if specified
             if bool(strip_zeros):
                 line["name"] = line["name"].rstrip("0")
 
-            # Adds the text. Converts the y position from being measured from the bottom to being measured from the top
+            # Adds the text
             # First positions then rotates text in accordance with its properties.
             # Then positions text at tip of line
             # (inverted order of operations relative to commands order below)
@@ -263,7 +484,7 @@ class SlideRuleScale:
                 insert=(0, 0),
                 transform="translate(" +
                           str(x[1]) + " " +
-                          str(paper_size_y - y[1]) + ") "
+                          str(y[1]) + ") "
                           "rotate(" + str(-line["t_angle"]) + ") "
                           "translate(" +
                           str(line["t_position_x"]) + " " +
@@ -274,26 +495,42 @@ class SlideRuleScale:
                       "font-family:" + line["t_font"]
                 ))
 
-        # Saves file
+        # Saves file, and keeps a copy in the cache
         drawing.save()
-        print()  # New line after drawing is complete
+        self._drawn("draw_straight", drawing_key, output, start, lines, backend)
 
     # Draws a full circular scale based on the scale spec and its draw specs
-    def draw_circular(self, output, draw_specs):
+    # - backend: "svgwrite" builds the whole svg before saving it, "stream" writes the svg as it is drawn
+    # - merge_lines: whether all lines should be drawn as a single path ("stream" backend only)
+    # - css_classes: whether line and text styles should be css classes, written once, instead of being repeated in
+    #                every element ("stream" backend only). The scale is drawn in a group, as in SlideRuleSheet
+    # - group_styles: whether the lines and texts of each style should be grouped, so that they don't need their own
+    #                 class (with css_classes only)
+    def draw_circular(self, output, draw_specs, backend="svgwrite", merge_lines=False, css_classes=False,
+                      group_styles=False):
 
         if not self.scale_set:
-            print("\nUnable to draw scale: scale type not set !!!")
+            logger.error("Unable to draw scale: scale type not set !!!")
             return
 
-        print("\nDrawing circular scale ...")
+        logger.info("Drawing circular scale ...")
+        start = self._start_measure()
+
+        # Reuses the svg if the scale and its draw specs did not change
+        drawing_key = self._drawing_key("circular", output, draw_specs, backend, merge_lines, css_classes, group_styles)
+        if drawing_key is not None and self.cache.load_file(drawing_key, output):
+            logger.info(" -Reused from cache")
+            self._report("draw_circular", start, positions=len(self.scale_spec), source="cache", backend=backend)
+            return
 
-        # Sets positions from 0 to 1 only (the circle goes from 0 to 1 and repeats)
-        self.scale_spec["position"] = self.scale_spec["position"] % 1
-        # Erases lines with coincident positions (multiple runs around the circle could be the cause)
-        self.scale_spec.drop_duplicates(subset="position", keep="last", inplace=True)
+        if css_classes or group_styles:
+            lines = self._draw_sheet("circular", output, read_draw_specs(draw_specs), backend, merge_lines, css_classes,
+                                     group_styles)
+            self._drawn("draw_circular", drawing_key, output, start, lines, backend)
+            return
 
         # Sets local variables from draw specs. Paper is a square of sides paper_size
-        draw_specs = pd.read_csv(draw_specs).loc[0]
+        draw_specs = read_draw_specs(draw_specs)
         paper_size = draw_specs["paper_size"]
         limit_radius = draw_specs["limit_radius"]
         scale_radius = draw_specs["scale_radius"]
@@ -305,7 +542,9 @@ class SlideRuleScale:
         center = paper_size / 2
 
         # Creates svg with appropriate dimensions and all units in mm
-        drawing = sw.Drawing(
+        drawing = _new_drawing(
+            backend,
+            merge_lines,
             filename=output,
             size=(str(paper_size) + "mm", str(paper_size) + "mm"),
             viewBox="0 0 " + str(paper_size) + " " + str(paper_size)
@@ -352,33 +591,30 @@ class SlideRuleScale:
             stroke="black"
             ))
 
-        # Iterates over each position in the created scale spec
-        for i, line in self.scale_spec.iterrows():
-            # Calculates r (radius) positions for base of line ([0]) and for tip of line ([1])
-            r = [scale_radius + line["l_position_base"], scale_radius + line["l_position_tip"]]
-            # Calculates theta (angle) position for the line
-            theta = np.pi / 2 - line["position"] * 2 * np.pi
-            # Converts (r, theta) to x and y positions for base of line ([0]) and for tip of line ([1])
-            x = r * np.cos([theta]) + [center]
-            y = r * np.sin([theta]) + [center]
-
-            # Adds the line. Converts the y position from being measured from the bottom to being measured from the top
+        # Calculates the base and tip of all lines, and the angle of all lines, at once
+        geometry = self._geometry_circular(draw_specs)
+        lines = len(geometry["index"])
+
+        # Iterates over each position in the created scale spec, together with its base ([0]) and tip ([1])
+        for line, x, y, rotation in zip(self._lines(geometry["index"]), _points(geometry, "x"), _points(geometry, "y"),
+                                        geometry["rotation"].tolist()):
+            # Adds the line
             drawing.add(drawing.line(
-                start=(x[0], 2 * center - y[0]),
-                end=(x[1], 2 * center - y[1]),
+                start=(x[0], y[0]),
+                end=(x[1], y[1]),
                 stroke_width=line["l_width"],
                 stroke="black"
                 ))
 
-            # Checks if any text properties are NaN. If so, jumps text adding code. If not, executes text adding code
-            if line[line.index.str.startswith("t_")].isnull().values.any():
+            # Checks if any text properties are blank. If so, jumps text adding code. If not, executes text adding code
+            if not line["has_text"]:
                 continue
 
             # Strips the zeros from the end of the name, if specified
             if bool(strip_zeros):
                 line["name"] = line["name"].rstrip("0")
 
-            # Adds the text. Converts the y position from being measured from the bottom to being measured from the top
+            # Adds the text
             # First positions then rotates text in accordance with its properties.
             # Then rotates text to line angle, plus 90°, for vertical line reference and horizontal text reference
             # Then positions text at tip of line
@@ -388,8 +624,8 @@ class SlideRuleScale:
                 insert=(0, 0),
                 transform="translate(" +
                           str(x[1]) + " " +
-                          str(2 * center - y[1]) + ") "
-                          "rotate(" + str(-np.degrees(theta) + 90) + ") "
+                          str(y[1]) + ") "
+                          "rotate(" + str(rotation) + ") "
                           "rotate(" + str(-line["t_angle"]) + ") "
                           "translate(" +
                           str(line["t_position_x"]) + " " +
@@ -400,10 +636,286 @@ class SlideRuleScale:
                       "font-family:" + line["t_font"]
                 ))
 
-        # Saves file
+        # Saves file, and keeps a copy in the cache
         drawing.save()
-        print()  # New line after drawing is complete
+        self._drawn("draw_circular", drawing_key, output, start, lines, backend)
+
+    # Draws a png preview of a straight scale, with the lines of draw_straight and without generating an svg. Labels are
+    # approximated as gray bars the size of their text, or omitted
+    # - dpi: resolution of the preview. Memory stays bounded at any resolution, as the image is drawn in bands of rows
+    # - labels: whether labels should be approximated or omitted
+    def preview_straight(self, output, draw_specs, dpi=150, labels=True):
+
+        if not self.scale_set:
+            logger.error("Unable to draw scale: scale type not set !!!")
+            return
+
+        logger.info("Drawing straight scale preview ...")
+        start = self._start_measure()
+
+        draw_specs = read_draw_specs(draw_specs)
+        preview = RasterPreview(output, (draw_specs["paper_size_x"], draw_specs["paper_size_y"]), dpi=dpi)
+        # Base line and mark line
+        for origin_y in [draw_specs["scale_origin_y"], draw_specs["mark_origin_y"]]:
+            preview.lines(draw_specs["scale_origin_x"], draw_specs["paper_size_y"] - origin_y,
+                          draw_specs["scale_origin_x"] + draw_specs["scale_size_x"],
+                          draw_specs["paper_size_y"] - origin_y, draw_specs["line_width"])
+        geometry = self._geometry_straight(draw_specs)
+        self._preview_lines(preview, geometry, draw_specs, labels)
+        preview.save()
+        self._report("preview_straight", start, positions=len(geometry["index"]), dpi=dpi)
+
+    # Draws a png preview of a circular scale, in the same way as preview_straight
+    def preview_circular(self, output, draw_specs, dpi=150, labels=True):
+
+        if not self.scale_set:
+            logger.error("Unable to draw scale: scale type not set !!!")
+            return
+
+        logger.info("Drawing circular scale preview ...")
+        start = self._start_measure()
+
+        draw_specs = read_draw_specs(draw_specs)
+        paper_size = draw_specs["paper_size"]
+        center = paper_size / 2
+        preview = RasterPreview(output, (paper_size, paper_size), dpi=dpi)
+        # Limit, base and mark circles, and center mark
+        for radius in [draw_specs["limit_radius"], draw_specs["scale_radius"], draw_specs["mark_radius"]]:
+            preview.circle((center, center), radius, draw_specs["line_width"])
+        half_size = draw_specs["centermark_size"] / 2
+        preview.lines([center - half_size, center], [center, center - half_size],
+                      [center + half_size, center], [center, center + half_size], draw_specs["line_width"])
+        geometry = self._geometry_circular(draw_specs)
+        self._preview_lines(preview, geometry, draw_specs, labels)
+        preview.save()
+        self._report("preview_circular", start, positions=len(geometry["index"]), dpi=dpi)
+
+    # Adds the lines of a scale geometry to a preview and, if requested, its labels as gray bars through the middle of
+    # their text, as high as the text
+    def _preview_lines(self, preview, geometry, draw_specs, labels):
+        index = geometry["index"]
+        preview.lines(geometry["x_base"], geometry["y_base"], geometry["x_tip"], geometry["y_tip"],
+                      self.scale_spec["l_width"][index])
+        if not labels:
+            return
+        names = self.scale_spec.names()
+        names = [names[i] for i in index.tolist()]
+        if bool(draw_specs["strip_zeros"]):
+            names = [name.rstrip("0") for name in names]
+        has_text = geometry["has_text"]
+        x, y, half_width, half_height, cos_angle, sin_angle = [values[has_text] for values in LabelLayout(
+            margin=0).rectangles(geometry, [len(name) for name in names], self.scale_spec["t_size"][index],
+                                 self.scale_spec["t_anchor"][index])]
+        preview.lines(x - half_width * cos_angle, y - half_width * sin_angle,
+                      x + half_width * cos_angle, y + half_width * sin_angle, 2 * half_height, intensity=0.3)
+
+    # Starts measuring an event: gets the current time and, while tracemalloc is tracing, the allocated memory
+    def _start_measure(self):
+        return time.perf_counter(), tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+    # Reports an event to the instrumentation hook, with the time and memory since start (None for instant events)
+    def _report(self, event, start, **details):
+        details = dict(event=event, time=None, memory=None, **details)
+        if start is not None:
+            details["time"] = time.perf_counter() - start[0]
+            if start[1] is not None and tracemalloc.is_tracing():
+                details["memory"] = tracemalloc.get_traced_memory()[0] - start[1]
+            logger.debug(" -" + event + " took {:.4f} s".format(details["time"]))
+        if self.instrumentation is not None:
+            self.instrumentation(details)
+
+    # Lays out the labels of the scale, as drawn by draw_straight or draw_circular (draw: "straight" or "circular") with
+    # the given draw specs, so that they don't overlap. Labels that overlap labels of higher priority are shortened or
+    # hidden (see LabelLayout) in the scale spec, until the scale type is set again.
+    # - layout: (optional) LabelLayout with the label size approximation and options
+    # - priority: (optional) priority of the label of each position in the scale spec. Higher priorities are kept first
+    # Returns the number of labels shown, shortened and hidden
+    def layout_labels(self, draw, draw_specs, layout=None, priority=None):
+
+        if not self.scale_set:
+            logger.error("Unable to lay out labels: scale type not set !!!")
+            return
+
+        logger.info("Laying out labels ...")
+        start = self._start_measure()
+
+        if draw not in ["straight", "circular"]:
+            raise ValueError("Unknown draw: '" + str(draw) + "'")
+        if layout is None:
+            layout = LabelLayout()
+        draw_specs = read_draw_specs(draw_specs)
+        geometry = self._geometry_straight(draw_specs) if draw == "straight" else self._geometry_circular(draw_specs)
+
+        # Lays out the labels of the positions that are drawn
+        index = geometry["index"]
+        names = self.scale_spec.names()
+        shown, texts = layout.layout(
+            geometry,
+            [names[i] for i in index.tolist()],
+            self.scale_spec["t_size"][index],
+            self.scale_spec["t_anchor"][index],
+            line_lengths=(self.scale_spec["l_position_tip"] - self.scale_spec["l_position_base"])[index],
+            priority=None if priority is None else np.asarray(priority)[index]
+            )
+
+        # Hides labels by blanking their text size, and replaces the names of shortened labels
+        hidden = index[geometry["has_text"] & ~shown]
+        shortened = [(i, text) for i, text in zip(index.tolist(), texts) if text != names[i]]
+        scale_spec = self.scale_spec.with_position(self.scale_spec.position)
+        if len(hidden):
+            t_size = scale_spec["t_size"].copy()
+            t_size[hidden] = np.nan
+            scale_spec["t_size"] = t_size
+        if shortened:
+            for i, text in shortened:
+                names[i] = text
+            scale_spec = scale_spec.with_names(names)
+        self.scale_spec = scale_spec
+        self.layout_fingerprint = digest("layout", hidden.tobytes(), *[str(i) + ":" + text for i, text in shortened])
+
+        counts = {"shown": int(shown.sum()), "shortened": len(shortened), "hidden": len(hidden)}
+        logger.info(" -Labels: " + str(counts["shown"]) + " shown (" + str(counts["shortened"]) + " shortened), " +
+                    str(counts["hidden"]) + " hidden")
+        self._report("layout_labels", start, positions=len(index), **counts)
+        return counts
+
+    # Draws the scale as a sheet with only this scale (see SlideRuleSheet), with styles as css classes. Returns the
+    # number of lines drawn
+    def _draw_sheet(self, draw, output, draw_specs, backend, merge_lines, css_classes, group_styles):
+        from SlideRuleSheet import SlideRuleSheet
+
+        if backend != "stream":
+            raise ValueError("CSS classes are only available with the 'stream' backend")
+        if not css_classes:
+            raise ValueError("Style groups are only available with CSS classes")
+
+        if draw == "straight":
+            sheet = SlideRuleSheet(draw_specs["paper_size_x"], draw_specs["paper_size_y"])
+            sheet.add_straight(self, draw_specs)
+        else:
+            sheet = SlideRuleSheet(draw_specs["paper_size"], draw_specs["paper_size"])
+            sheet.add_circular(self, draw_specs)
+        sheet.draw(output, merge_lines=merge_lines, group_styles=group_styles)
+        return len(sheet.entries[0]["geometry"]["index"])
+
+    # Keeps a copy of a drawing that was just saved in the cache, and reports it
+    def _drawn(self, draw, drawing_key, output, start, lines, backend):
+        if drawing_key is not None:
+            self.cache.save_file(drawing_key, output)
+        self._report(draw, start, positions=lines, source="drawn", backend=backend)
+
+    # Gets the cache key of a drawing, from the fingerprints of the scale, its type (parameters and fingerprint of the
+    # scale type) and its draw specs.
+    # Returns None if there is no cache or the drawing can't be cached (output to a file-like object or draw specs that
+    # are not a file)
+    def _drawing_key(self, draw, output, draw_specs, backend, merge_lines, css_classes=False, group_styles=False):
+        if self.cache is None or hasattr(output, "write") or not isinstance(draw_specs, (str, os.PathLike)):
+            return None
+        with open(draw_specs, "rb") as file:
+            draw_specs_data = file.read()
+        scale_parameters = repr(self.scale_parameters) + str(self.scale_type_fingerprint)
+        if self.layout_fingerprint is not None:
+            scale_parameters += self.layout_fingerprint
+        options = [backend, merge_lines] + ([css_classes, group_styles] if css_classes or group_styles else [])
+        return self.cache.key("drawing", draw, self.fingerprint, scale_parameters, draw_specs_data, *options)
+
+    # Calculates the geometry of a straight scale, for all positions at once, in accordance with its draw specs.
+    # Coordinates are in the svg system: in mm, with y measured from the top of the paper.
+    # Returns a dictionary of arrays:
+    # - index: index of each position in the scale spec
+    # - x_base, y_base, x_tip, y_tip: coordinates of the base and of the tip of each line
+    # - rotation: angle of each line relative to a vertical line, in svg degrees (always 0 for straight scales)
+    # - label_x, label_y, label_angle: anchor coordinates and angle (in svg degrees) of each text
+    # - has_text: whether each position has text
+    def geometry_straight(self, draw_specs):
+
+        if not self.scale_set:
+            logger.error("Unable to calculate geometry: scale type not set !!!")
+            return
+
+        return self._geometry_straight(read_draw_specs(draw_specs))
+
+    # Calculates the geometry of a circular scale, for all positions at once, in accordance with its draw specs.
+    # Positions go around the circle from 0 to 1 and, for coincident positions, only the last one is kept.
+    # Returns a dictionary of arrays, in the same way as geometry_straight
+    def geometry_circular(self, draw_specs):
+
+        if not self.scale_set:
+            logger.error("Unable to calculate geometry: scale type not set !!!")
+            return
+
+        return self._geometry_circular(read_draw_specs(draw_specs))
+
+    def _geometry_straight(self, draw_specs):
+        # x positions for all lines. Base and tip of straight lines share the same x position
+        x = draw_specs["scale_origin_x"] + self.scale_spec["position"] * draw_specs["scale_size_x"]
+        # y positions. Converts the y position from being measured from the bottom to being measured from the top
+        y_base = draw_specs["paper_size_y"] - (draw_specs["scale_origin_y"] + self.scale_spec["l_position_base"])
+        y_tip = draw_specs["paper_size_y"] - (draw_specs["scale_origin_y"] + self.scale_spec["l_position_tip"])
+
+        return self._label_geometry({
+            "index": np.arange(len(self.scale_spec)),
+            "x_base": x,
+            "y_base": y_base,
+            "x_tip": x,
+            "y_tip": y_tip,
+            "rotation": np.zeros(len(self.scale_spec))
+            })
+
+    def _geometry_circular(self, draw_specs):
+        # Defines center of circle at center of paper
+        center = draw_specs["paper_size"] / 2
+
+        # Keeps only the last of coincident positions around the circle
+        position = self.scale_spec["position"] % 1
+        index = _last_unique(position)
+        # Calculates r (radius) positions for base and for tip of all lines
+        r_base = draw_specs["scale_radius"] + self.scale_spec["l_position_base"][index]
+        r_tip = draw_specs["scale_radius"] + self.scale_spec["l_position_tip"][index]
+        # Calculates theta (angle) position for all lines
+        theta = np.pi / 2 - position[index] * 2 * np.pi
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+
+        # Converts (r, theta) to x and y positions
+        # Converts the y position from being measured from the bottom to being measured from the top
+        return self._label_geometry({
+            "index": index,
+            "x_base": r_base * cos_theta + center,
+            "y_base": 2 * center - (r_base * sin_theta + center),
+            "x_tip": r_tip * cos_theta + center,
+            "y_tip": 2 * center - (r_tip * sin_theta + center),
+            "rotation": -np.degrees(theta) + 90
+            })
+
+    # Adds the text anchor position and angle of each position to its line geometry. The text is rotated by the line
+    # rotation and by its own angle around the tip of the line, and then offset by its position in the rotated system
+    def _label_geometry(self, geometry):
+        index = geometry["index"]
+        label_angle = geometry["rotation"] - self.scale_spec["t_angle"][index]
+        cos_angle = np.cos(np.radians(label_angle))
+        sin_angle = np.sin(np.radians(label_angle))
+        offset_x = self.scale_spec["t_position_x"][index]
+        offset_y = -self.scale_spec["t_position_y"][index]
+
+        geometry["label_x"] = geometry["x_tip"] + offset_x * cos_angle - offset_y * sin_angle
+        geometry["label_y"] = geometry["y_tip"] + offset_x * sin_angle + offset_y * cos_angle
+        geometry["label_angle"] = label_angle
+        geometry["has_text"] = self.scale_spec.has_text()[index]
+        return geometry
+
+    # Iterates over each position in the scale spec (or only over the given indices), as a dictionary of its values plus
+    # whether it has text
+    def _lines(self, indices=None):
+        return self.scale_spec.rows(indices)
 
     # Outputs the scale spec in a csv file
     def debug_output_full_scale_spec(self):
-        self.scale_spec.to_csv("DEBUG_scale_spec.csv")
+        self.scale_spec.to_dataframe().to_csv("DEBUG_scale_spec.csv")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python SlideRuleScale.py scale_specs_dir compiled_file")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    SlideRuleScale(os.path.join(sys.argv[1], "")).compile(sys.argv[2])
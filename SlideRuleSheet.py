@@ -0,0 +1,224 @@
+import logging
+
+from SlideRuleScale import read_draw_specs
+from SvgStream import SvgStream
+
+logger = logging.getLogger(__name__)
+
+
+# Composes several scales into a single svg sheet, such as all the concentric scales of one side of a circular slide
+# rule. Each scale is drawn as in draw_straight or draw_circular, in its own group, placed on the sheet.
+# The sheet is written in a single pass with the "stream" backend. Styles are shared by all scales: lines and texts
+# refer to css classes in the defs of the sheet, instead of repeating their stroke and font in every element.
+# Elements can also be grouped by style, so that only each group refers to a class.
+# - width, height: size of the sheet, in mm
+class SlideRuleSheet:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.entries = []
+
+    # Adds a straight scale, as drawn by draw_straight with the given draw specs, with the top left corner of its paper
+    # at origin. Draw specs can be changed with keyword arguments (such as scale_size_x=250).
+    # The scale is added as it is now: setting its scale type again does not change the sheet
+    def add_straight(self, scale, draw_specs, origin=(0, 0), name=None, **changes):
+        draw_specs = dict(read_draw_specs(draw_specs), **changes)
+        self._add("straight", scale, draw_specs, scale.geometry_straight(draw_specs), origin, name, {})
+
+    # Adds a circular scale, as drawn by draw_circular with the given draw specs, centered at center (the center of the
+    # sheet by default). Draw specs can be changed with keyword arguments (such as scale_radius=40).
+    # - limit_circle, center_mark: whether the limit circle and the center mark are drawn. Concentric scales only need
+    #                              them once
+    # The scale is added as it is now: setting its scale type again does not change the sheet
+    def add_circular(self, scale, draw_specs, center=None, name=None, limit_circle=True, center_mark=True, **changes):
+        # The scale is drawn around (0, 0), and its group is moved to the center
+        draw_specs = dict(read_draw_specs(draw_specs), paper_size=0, **changes)
+        if center is None:
+            center = (self.width / 2, self.height / 2)
+        self._add("circular", scale, draw_specs, scale.geometry_circular(draw_specs), center, name,
+                  {"limit_circle": limit_circle, "center_mark": center_mark})
+
+    def _add(self, draw, scale, draw_specs, geometry, offset, name, options):
+        if geometry is None:
+            raise ValueError("Unable to add scale to sheet: scale type not set")
+        self.entries.append(dict(
+            options,
+            draw=draw,
+            scale_spec=scale.scale_spec,
+            draw_specs=draw_specs,
+            geometry=geometry,
+            offset=offset,
+            name="scale" + str(len(self.entries) + 1) if name is None else name
+        ))
+
+    # Draws the sheet to output (file name or file-like object)
+    # - merge_lines: whether the lines of each scale should be drawn as a single path for each stroke width
+    # - group_styles: whether the lines and texts of each scale should be grouped by style, instead of each element
+    #                 having its own class. Elements are then not drawn in the order of the scale
+    def draw(self, output, merge_lines=False, group_styles=False):
+
+        logger.info("Drawing sheet of " + str(len(self.entries)) + " scales ...")
+
+        stroke_classes, text_classes = self._classes()
+        styles = {}
+        for stroke_width, class_name in stroke_classes.items():
+            styles["." + class_name] = "fill:none;stroke:black;stroke-width:" + stroke_width
+        for (size, anchor, font), class_name in text_classes.items():
+            styles["." + class_name] = ("fill:black;font-size:" + size + "px;text-anchor:" + anchor + ";"
+                                        "font-family:" + font)
+
+        drawing = SvgStream(
+            output,
+            size=(str(self.width) + "mm", str(self.height) + "mm"),
+            viewBox="0 0 " + str(self.width) + " " + str(self.height),
+            merge_lines=merge_lines,
+            styles=styles
+            )
+        for entry in self.entries:
+            drawing.open_group(id=entry["name"],
+                               transform="translate(" + str(entry["offset"][0]) + " " + str(entry["offset"][1]) + ")")
+            styled = _StyleGroups(drawing, group_styles)
+            if entry["draw"] == "straight":
+                self._draw_straight(styled, entry, stroke_classes, text_classes)
+            else:
+                self._draw_circular(styled, entry, stroke_classes, text_classes)
+            styled.close()
+            drawing.close_group()
+        drawing.save()
+
+    # Gets the css class of each stroke width and of each text style (size, anchor and font) used in the sheet
+    def _classes(self):
+        stroke_widths = {}
+        text_styles = {}
+        for entry in self.entries:
+            stroke_widths.setdefault(str(entry["draw_specs"]["line_width"]), None)
+            index = entry["geometry"]["index"]
+            for width in entry["scale_spec"]["l_width"][index].tolist():
+                stroke_widths.setdefault(str(width), None)
+            has_text = entry["geometry"]["has_text"]
+            text_index = index[has_text]
+            for style in zip(entry["scale_spec"]["t_size"][text_index].tolist(),
+                             entry["scale_spec"]["t_anchor"][text_index].tolist(),
+                             entry["scale_spec"]["t_font"][text_index].tolist()):
+                text_styles.setdefault((str(style[0]), style[1], style[2]), None)
+        return ({width: "s" + str(i) for i, width in enumerate(stroke_widths)},
+                {style: "t" + str(i) for i, style in enumerate(text_styles)})
+
+    # Draws a straight scale in the same way as draw_straight
+    @staticmethod
+    def _draw_straight(drawing, entry, stroke_classes, text_classes):
+        draw_specs = entry["draw_specs"]
+        geometry = entry["geometry"]
+        line_class = stroke_classes[str(draw_specs["line_width"])]
+
+        # Base line and mark line
+        for origin_y in [draw_specs["scale_origin_y"], draw_specs["mark_origin_y"]]:
+            drawing.add(drawing.line(
+                start=(draw_specs["scale_origin_x"], draw_specs["paper_size_y"] - origin_y),
+                end=(draw_specs["scale_origin_x"] + draw_specs["scale_size_x"], draw_specs["paper_size_y"] - origin_y),
+                class_=line_class
+                ))
+
+        for line, x, y in zip(entry["scale_spec"].rows(geometry["index"]),
+                              zip(geometry["x_base"].tolist(), geometry["x_tip"].tolist()),
+                              zip(geometry["y_base"].tolist(), geometry["y_tip"].tolist())):
+            drawing.add(drawing.line(start=(x[0], y[0]), end=(x[1], y[1]), class_=stroke_classes[str(line["l_width"])]))
+            if not line["has_text"]:
+                continue
+            drawing.add(drawing.text(
+                _label(line, draw_specs),
+                insert=(0, 0),
+                transform="translate(" + str(x[1]) + " " + str(y[1]) + ") "
+                          "rotate(" + str(-line["t_angle"]) + ") "
+                          "translate(" + str(line["t_position_x"]) + " " + str(-line["t_position_y"]) + ") ",
+                class_=_text_class(line, text_classes)
+                ))
+
+    # Draws a circular scale in the same way as draw_circular, around (0, 0)
+    @staticmethod
+    def _draw_circular(drawing, entry, stroke_classes, text_classes):
+        draw_specs = entry["draw_specs"]
+        geometry = entry["geometry"]
+        line_class = stroke_classes[str(draw_specs["line_width"])]
+
+        # Limit, base and mark circles
+        radii = [draw_specs["scale_radius"], draw_specs["mark_radius"]]
+        if entry["limit_circle"]:
+            radii.insert(0, draw_specs["limit_radius"])
+        for radius in radii:
+            drawing.add(drawing.circle(center=(0, 0), r=radius, class_=line_class))
+        # Center mark
+        if entry["center_mark"]:
+            half_size = draw_specs["centermark_size"] / 2
+            drawing.add(drawing.line(start=(-half_size, 0), end=(half_size, 0), class_=line_class))
+            drawing.add(drawing.line(start=(0, -half_size), end=(0, half_size), class_=line_class))
+
+        for line, x, y, rotation in zip(entry["scale_spec"].rows(geometry["index"]),
+                                        zip(geometry["x_base"].tolist(), geometry["x_tip"].tolist()),
+                                        zip(geometry["y_base"].tolist(), geometry["y_tip"].tolist()),
+                                        geometry["rotation"].tolist()):
+            drawing.add(drawing.line(start=(x[0], y[0]), end=(x[1], y[1]), class_=stroke_classes[str(line["l_width"])]))
+            if not line["has_text"]:
+                continue
+            drawing.add(drawing.text(
+                _label(line, draw_specs),
+                insert=(0, 0),
+                transform="translate(" + str(x[1]) + " " + str(y[1]) + ") "
+                          "rotate(" + str(rotation) + ") "
+                          "rotate(" + str(-line["t_angle"]) + ") "
+                          "translate(" + str(line["t_position_x"]) + " " + str(-line["t_position_y"]) + ") ",
+                class_=_text_class(line, text_classes)
+                ))
+
+
+# Adds elements to a drawing with their css class. When styles are grouped, elements are kept by class instead, and
+# written without it in one group for each class when closed
+class _StyleGroups:
+    def __init__(self, drawing, group_styles):
+        self.drawing = drawing
+        self.group_styles = group_styles
+        self._groups = {}
+
+    # Creates a line, circle or text with the given class
+    def line(self, class_, **extra):
+        return self._styled(self.drawing.line, class_, extra)
+
+    def circle(self, class_, **extra):
+        return self._styled(self.drawing.circle, class_, extra)
+
+    def text(self, text, class_, **extra):
+        return self._styled(self.drawing.text, class_, dict(extra, text=text))
+
+    def _styled(self, create, class_, extra):
+        if self.group_styles:
+            return class_, create(**extra)
+        return None, create(class_=class_, **extra)
+
+    # Adds an element, or keeps it in the group of its class
+    def add(self, element):
+        class_, element = element
+        if class_ is None:
+            self.drawing.add(element)
+        else:
+            self._groups.setdefault(class_, []).append(element)
+
+    # Writes the group of each class
+    def close(self):
+        for class_, elements in self._groups.items():
+            self.drawing.open_group(class_=class_)
+            for element in elements:
+                self.drawing.add(element)
+            self.drawing.close_group()
+        self._groups = {}
+
+
+# Gets the text of a label, with the trailing zeros stripped if specified in the draw specs
+def _label(line, draw_specs):
+    if bool(draw_specs["strip_zeros"]):
+        return line["name"].rstrip("0")
+    return line["name"]
+
+
+# Gets the css class of the text style of a line
+def _text_class(line, text_classes):
+    return text_classes[(str(line["t_size"]), line["t_anchor"], line["t_font"])]
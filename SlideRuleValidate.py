@@ -0,0 +1,333 @@
+from LabelLayout import LabelLayout
+from SlideRuleProject import load_scale, read_manifest
+from SlideRuleScale import read_draw_specs
+from ScaleTypes import get_scale_type
+from TickTable import TickTable
+import concurrent.futures
+import csv
+import decimal
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+# Columns of the spec files, besides their own first column (name, interval, or name and position)
+PROPERTY_COLUMNS = [column for column in TickTable.COLUMNS if column not in ["name", "position"]]
+TEXT_ANCHORS = ["start", "middle", "end"]
+DRAW_SPEC_COLUMNS = {
+    "straight": ["paper_size_x", "paper_size_y", "scale_size_x", "scale_origin_x", "scale_origin_y", "mark_origin_y",
+                 "line_width", "strip_zeros"],
+    "circular": ["paper_size", "limit_radius", "scale_radius", "mark_radius", "centermark_size", "line_width",
+                 "strip_zeros"]
+}
+# Number of names listed in each issue, at most
+MAX_NAMES = 10
+
+
+# Validates every scale of a slide rule project concurrently, across a pool of processes, without drawing them.
+# For each scale, checks:
+# - that Core.csv, every x-y.csv and one-offs.csv have the expected columns and values, that core positions go up,
+#   and that every sector between two core positions has its x-y.csv file (and that there are no other x-y.csv files)
+# - that every mold row generates positions: its interval is smaller than its sector, and is not a multiple of the
+#   interval of an earlier row, whose positions would always be used instead
+# - that the scale type is known and the draw specs have the columns of the draw
+# - all positions that are off scale (under 0 or over 1) or invalid, after setting the scale type
+# - labels that overlap other labels, as laid out by LabelLayout
+# Positions and labels are only checked if the spec files are valid (sectors without file are checked as empty).
+# - processes: number of processes. Defaults to the number of CPUs. With 1 process, scales are validated one at a time
+# - report: (optional) json file where the report is saved
+# Returns the report: a dictionary with the list of scales, each with its name, status ("ok", "warnings" or "errors"),
+# number of positions, time taken and issues. Each issue is a dictionary with its level ("error", "warning" or "info"),
+# check, file and message
+def validate_project(manifest, processes=None, report=None):
+
+    print("\nValidating project " + str(manifest) + " ...")
+
+    jobs = read_manifest(manifest)
+    start = time.perf_counter()
+    if processes == 1:
+        scales = [validate_scale(job) for job in jobs]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            scales = list(executor.map(validate_scale, jobs))
+    total_time = time.perf_counter() - start
+
+    result = {
+        "manifest": str(manifest),
+        "scales": scales,
+        "errors": sum(issue["level"] == "error" for scale in scales for issue in scale["issues"]),
+        "warnings": sum(issue["level"] == "warning" for scale in scales for issue in scale["issues"]),
+        "time": total_time
+    }
+    if report is not None:
+        with open(report, "w") as file:
+            json.dump(result, file, indent=2)
+    print_report(result)
+    return result
+
+
+# Validates a single scale of a project (a job from read_manifest). Returns its part of the report
+def validate_scale(job):
+    result = {"name": job["name"], "status": "ok", "positions": None, "time": None, "issues": []}
+    issues = result["issues"]
+
+    # Import messages (such as missing files) are reported as issues instead
+    logger = logging.getLogger("SlideRuleScale")
+    level = logger.level
+    logger.setLevel(logging.ERROR)
+
+    start = time.perf_counter()
+    try:
+        if not os.path.isfile(job["scale_specs_dir"]):
+            _check_spec_files(job["scale_specs_dir"], issues)
+        try:
+            get_scale_type(job["scale_type"])
+        except ValueError as error:
+            issues.append(_issue("error", "scale_type", None, str(error)))
+        draw_specs = _check_draw_specs(job["draw_specs"], job["draw"], issues)
+
+        # Missing sectors are imported as empty, as in a build. Other errors would make the import fail
+        if not any(issue["level"] == "error" and issue["check"] != "coverage" for issue in issues):
+            scale = load_scale(job)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scale.set_scale_type(job["scale_type"], invert_scale=job["invert_scale"],
+                                     positioning_factor=job["positioning_factor"], log_base=job["log_base"])
+            result["positions"] = len(scale.scale_spec)
+            _check_positions(scale, issues)
+            _check_labels(scale, job, draw_specs, issues)
+    except Exception as error:
+        issues.append(_issue("error", "exception", None, type(error).__name__ + ": " + str(error)))
+    finally:
+        logger.setLevel(level)
+    result["time"] = time.perf_counter() - start
+
+    if any(issue["level"] == "error" for issue in issues):
+        result["status"] = "errors"
+    elif any(issue["level"] == "warning" for issue in issues):
+        result["status"] = "warnings"
+    return result
+
+
+# Creates an issue of the report
+def _issue(level, check, filename, message):
+    return {"level": level, "check": check, "file": None if filename is None else os.path.normpath(filename),
+            "message": message}
+
+
+# Reads a csv file as its header and its rows (as dictionaries). Returns None if the file does not exist
+def _read_csv(filename):
+    try:
+        with open(filename, newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            return reader.fieldnames or [], list(reader)
+    except FileNotFoundError:
+        return None
+
+
+# Reads a number written as text. Returns None if it is not a finite number
+def _number(text):
+    try:
+        number = decimal.Decimal(str(text).strip())
+    except decimal.InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+# Checks the columns of a spec file, and the values of the property columns of its rows
+def _check_columns(filename, header, rows, first_columns, issues):
+    missing = [column for column in first_columns + PROPERTY_COLUMNS if column not in header]
+    if missing:
+        issues.append(_issue("error", "columns", filename, "missing columns: " + ", ".join(missing)))
+    unknown = [column for column in header if column not in first_columns + PROPERTY_COLUMNS]
+    if unknown:
+        issues.append(_issue("warning", "columns", filename, "unknown columns: " + ", ".join(unknown)))
+
+    text_columns = [column for column in PROPERTY_COLUMNS if column.startswith("t_") and column in header]
+    for row_number, row in enumerate(rows, start=2):
+        for column in PROPERTY_COLUMNS:
+            value = (row.get(column) or "").strip()
+            if column in TickTable.INTERNED_COLUMNS:
+                if column == "t_anchor" and value and value not in TEXT_ANCHORS:
+                    issues.append(_issue("error", "values", filename, "row " + str(row_number) + ": " + column +
+                                         " must be one of " + ", ".join(TEXT_ANCHORS) + ", not '" + value + "'"))
+            elif column in header and (value or not column.startswith("t_")) and _number(value) is None:
+                issues.append(_issue("error", "values", filename, "row " + str(row_number) + ": " + column +
+                                     " is not a number: '" + value + "'"))
+        # Labels are only drawn if all their text properties are given
+        blank = [column for column in text_columns if not (row.get(column) or "").strip()]
+        if blank and len(blank) < len(text_columns):
+            issues.append(_issue("warning", "values", filename, "row " + str(row_number) + ": label is not drawn, "
+                                 "as some of its text properties are blank: " + ", ".join(blank)))
+
+
+# Checks the spec files of a scale specs directory: Core.csv, the x-y.csv file of every sector and one-offs.csv
+def _check_spec_files(scale_specs_dir, issues):
+    filename = os.path.join(scale_specs_dir, "Core.csv")
+    core = _read_csv(filename)
+    if core is None:
+        issues.append(_issue("error", "files", filename, "file not found"))
+        return
+    header, rows = core
+    _check_columns(filename, header, rows, ["name"], issues)
+
+    # Core positions must be numbers, going up
+    names = [(row.get("name") or "") for row in rows]
+    positions = [_number(name) for name in names]
+    for row_number, (name, position) in enumerate(zip(names, positions), start=2):
+        if position is None:
+            issues.append(_issue("error", "core", filename, "row " + str(row_number) + ": name is not a number: '" +
+                                 name + "'"))
+    if len(rows) < 2:
+        issues.append(_issue("error", "core", filename, "at least 2 core positions are needed"))
+    bounds = list(zip(names[:-1], names[1:]))
+    for (lower, upper), (lower_position, upper_position) in zip(bounds, zip(positions[:-1], positions[1:])):
+        if lower_position is not None and upper_position is not None and not lower_position < upper_position:
+            issues.append(_issue("error", "core", filename, "core positions must go up: " + upper + " after " +
+                                 lower))
+
+    # Every sector has its file, and there are no files of other sectors
+    sector_files = {lower + "-" + upper + ".csv" for lower, upper in bounds}
+    for filename in sorted(os.listdir(scale_specs_dir)):
+        if re.fullmatch(r"[^-]+-[^-]+\.csv", filename) and filename not in sector_files | {"one-offs.csv"}:
+            issues.append(_issue("warning", "coverage", os.path.join(scale_specs_dir, filename),
+                                 "file does not match any sector between two core positions, and is not used"))
+    for (lower, upper), (lower_position, upper_position) in zip(bounds, zip(positions[:-1], positions[1:])):
+        filename = os.path.join(scale_specs_dir, lower + "-" + upper + ".csv")
+        sector = _read_csv(filename)
+        if sector is None:
+            issues.append(_issue("error", "coverage", filename, "file not found: sector " + lower + " to " + upper +
+                                 " has no positions"))
+            continue
+        header, rows = sector
+        _check_columns(filename, header, rows, ["interval"], issues)
+        _check_mold(filename, rows, lower_position, upper_position, issues)
+
+    filename = os.path.join(scale_specs_dir, "one-offs.csv")
+    one_offs = _read_csv(filename)
+    if one_offs is None:
+        issues.append(_issue("info", "files", filename, "file not found: no one-offs"))
+        return
+    header, rows = one_offs
+    _check_columns(filename, header, rows, ["name", "position"], issues)
+    for row_number, row in enumerate(rows, start=2):
+        if _number(row.get("position") or "") is None:
+            issues.append(_issue("error", "values", filename, "row " + str(row_number) + ": position is not a number: '"
+                                 + (row.get("position") or "") + "'"))
+
+
+# Checks the mold rows of a sector: intervals must be positive numbers, and each row must generate positions of its own
+def _check_mold(filename, rows, lower_position, upper_position, issues):
+    intervals = []
+    for row_number, row in enumerate(rows, start=2):
+        interval = _number(row.get("interval") or "")
+        if interval is None or not interval > 0:
+            issues.append(_issue("error", "mold", filename, "row " + str(row_number) + ": interval must be a positive "
+                                 "number, not '" + (row.get("interval") or "") + "'"))
+            continue
+        if lower_position is not None and upper_position is not None and interval >= upper_position - lower_position:
+            issues.append(_issue("warning", "mold", filename, "row " + str(row_number) + ": interval " +
+                                 str(interval) + " generates no positions, as it is not smaller than the sector"))
+        # Positions of all rows start at the lower bound, so rows with a multiple of an earlier interval are covered
+        for earlier_row, earlier in intervals:
+            if interval % earlier == 0:
+                issues.append(_issue("warning", "mold", filename, "row " + str(row_number) + ": interval " +
+                                     str(interval) + " generates no positions, as they are all generated by row " +
+                                     str(earlier_row) + " (interval " + str(earlier) + ") first"))
+                break
+        intervals.append((row_number, interval))
+
+
+# Checks that the draw specs file has the columns of the draw, with numbers. Returns the draw specs, or None if they
+# are not valid
+def _check_draw_specs(filename, draw, issues):
+    draw_specs = _read_csv(filename)
+    if draw_specs is None:
+        issues.append(_issue("error", "draw_specs", filename, "file not found"))
+        return None
+    header, rows = draw_specs
+    missing = [column for column in DRAW_SPEC_COLUMNS[draw] if column not in header]
+    if missing:
+        issues.append(_issue("error", "draw_specs", filename, "missing columns for " + draw + " scales: " +
+                             ", ".join(missing)))
+        return None
+    if not rows:
+        issues.append(_issue("error", "draw_specs", filename, "no draw specs"))
+        return None
+    invalid = [column for column in DRAW_SPEC_COLUMNS[draw] if _number(rows[0][column] or "") is None]
+    if invalid:
+        issues.append(_issue("error", "draw_specs", filename, "values are not numbers: " + ", ".join(invalid)))
+        return None
+    return read_draw_specs(filename)
+
+
+# Lists some names, and how many more there are
+def _names(names):
+    listed = ", ".join(names[:MAX_NAMES])
+    if len(names) > MAX_NAMES:
+        listed += " and " + str(len(names) - MAX_NAMES) + " more"
+    return listed
+
+
+# Checks all positions of a scale, after setting its scale type: invalid positions, and positions off scale
+def _check_positions(scale, issues):
+    position = scale.scale_spec["position"]
+    names = scale.scale_spec.names()
+    invalid = np.flatnonzero(~np.isfinite(position))
+    if len(invalid):
+        issues.append(_issue("error", "positions", None, str(len(invalid)) + " positions are invalid for the scale "
+                             "type (such as the logarithm of 0 or of a negative number): " +
+                             _names([names[i] for i in invalid.tolist()])))
+    for location, off_scale in [("under the minimum", position < 0), ("over the maximum", position > 1)]:
+        off_scale = np.flatnonzero(off_scale)
+        if len(off_scale):
+            issues.append(_issue("warning", "positions", None, str(len(off_scale)) + " positions are located " +
+                                 location + ": " + _names([names[i] for i in off_scale.tolist()])))
+
+
+# Checks the labels of a scale for overlaps, as laid out by LabelLayout with its geometry. Overlaps are only
+# informative when the project lays out the labels of the scale, as overlapping labels are hidden then
+def _check_labels(scale, job, draw_specs, issues):
+    if draw_specs is None:
+        return
+    if job["draw"] == "straight":
+        geometry = scale.geometry_straight(draw_specs)
+    else:
+        geometry = scale.geometry_circular(draw_specs)
+    index = geometry["index"]
+    names = scale.scale_spec.names()
+    names = [names[i] for i in index.tolist()]
+    shown, texts = LabelLayout().layout(
+        geometry, names, scale.scale_spec["t_size"][index], scale.scale_spec["t_anchor"][index],
+        line_lengths=(scale.scale_spec["l_position_tip"] - scale.scale_spec["l_position_base"])[index])
+    overlapping = np.flatnonzero(geometry["has_text"] & ~shown)
+    if len(overlapping):
+        issues.append(_issue("info" if job["layout_labels"] else "warning", "labels", job["draw_specs"],
+                             str(len(overlapping)) + " labels overlap labels of longer lines or larger texts: " +
+                             _names([names[i] for i in overlapping.tolist()])))
+
+
+# Prints the validation report: a table with the status of each scale, and the issues of each scale
+def print_report(report):
+    print("\n{:<16} {:>9} {:>9}  {}".format("Scale", "Positions", "Time (s)", "Status"))
+    for scale in report["scales"]:
+        print("{:<16} {:>9} {:>9.3f}  {}".format(
+            scale["name"], "-" if scale["positions"] is None else scale["positions"], scale["time"], scale["status"]))
+    for scale in report["scales"]:
+        for issue in scale["issues"]:
+            if issue["level"] != "info":
+                print(" -" + scale["name"] + ": " + issue["level"] + " (" + issue["check"] + ")" +
+                      (" " + issue["file"] if issue["file"] else "") + ": " + issue["message"])
+    print("\n" + str(len(report["scales"])) + " scales validated in {:.3f} s".format(report["time"]) +
+          " (" + str(report["errors"]) + " errors, " + str(report["warnings"]) + " warnings)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python SlideRuleValidate.py manifest.csv [report.json] [processes]")
+    result = validate_project(sys.argv[1], report=sys.argv[2] if len(sys.argv) >= 3 else None,
+                              processes=int(sys.argv[3]) if len(sys.argv) == 4 else None)
+    sys.exit(1 if result["errors"] else 0)
@@ -0,0 +1,136 @@
+from SlideRuleProject import load_scale, read_manifest
+import os
+import sys
+import time
+
+
+# Watches the spec files of a slide rule project (see SlideRuleProject) and draws again the outputs affected by each
+# edit, while the scales are kept in memory:
+# - Spec files are polled for changes (modification time and size), so it works on any file system
+# - When files of a scale specs directory change, only the sectors whose files changed are generated again. Compiled
+#   spec files are loaded again when they change
+# - Only the outputs whose scale or draw specs changed are drawn again
+# - backend, merge_lines: svg backend options of draw_straight and draw_circular
+class SlideRuleWatch:
+    def __init__(self, manifest, backend="stream", merge_lines=False):
+        self.jobs = read_manifest(manifest)
+        self.backend = backend
+        self.merge_lines = merge_lines
+
+        # Scales in memory, one for each scale specs directory or compiled spec file (shared by all outputs from it)
+        self.scales = {}
+        # Modification time and size of each watched file
+        self.snapshot = {}
+
+    # Imports all scales and draws all outputs
+    def start(self):
+        start = time.perf_counter()
+        self.snapshot = self._snapshot()
+        for job in self.jobs:
+            specs_dir = os.path.normpath(job["scale_specs_dir"])
+            if specs_dir not in self.scales:
+                self.scales[specs_dir] = load_scale(job)
+            self._draw(job)
+        print("Built " + str(len(self.jobs)) + " outputs in {:.0f} ms".format((time.perf_counter() - start) * 1000))
+
+    # Checks the spec files once, and updates the scales and outputs affected by the changed files.
+    # Returns the names of the outputs that were drawn again
+    def poll(self):
+        snapshot = self._snapshot()
+        changed_files = {path for path in snapshot.keys() | self.snapshot.keys()
+                         if snapshot.get(path) != self.snapshot.get(path)}
+        self.snapshot = snapshot
+        if not changed_files:
+            return []
+
+        start = time.perf_counter()
+        changed_files_dirs = {os.path.dirname(path) for path in changed_files}
+
+        # Imports again the scales with changed files (or whose compiled spec file changed). Scales whose specs can't be
+        # imported keep their last state
+        changed_scales = set()
+        for specs_dir, scale in self.scales.items():
+            if specs_dir not in changed_files_dirs and specs_dir not in changed_files:
+                continue
+            try:
+                if scale.reload():
+                    changed_scales.add(specs_dir)
+            except Exception as error:
+                print("Unable to import " + specs_dir + ": " + type(error).__name__ + ": " + str(error))
+
+        # Draws again the outputs whose scale or draw specs changed
+        drawn = []
+        for job in self.jobs:
+            if (os.path.normpath(job["scale_specs_dir"]) in changed_scales or
+                    os.path.normpath(job["draw_specs"]) in changed_files):
+                if self._draw(job):
+                    drawn.append(job["name"])
+
+        print("Changed: " + ", ".join(sorted(os.path.relpath(path) for path in changed_files)))
+        print(" -Drawn again: " + (", ".join(drawn) if drawn else "nothing") +
+              " in {:.0f} ms".format((time.perf_counter() - start) * 1000))
+        return drawn
+
+    # Polls the spec files every interval seconds, until interrupted
+    def watch(self, interval=0.2):
+        self.start()
+        print("Watching for changes (Ctrl+C to stop) ...")
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+
+    # Sets the scale type of an output and draws it. Returns whether it was drawn
+    def _draw(self, job):
+        scale = self.scales[os.path.normpath(job["scale_specs_dir"])]
+        try:
+            scale.set_scale_type(job["scale_type"], invert_scale=job["invert_scale"],
+                                 positioning_factor=job["positioning_factor"], log_base=job["log_base"])
+            if job["layout_labels"]:
+                scale.layout_labels(job["draw"], job["draw_specs"])
+            draw = scale.draw_straight if job["draw"] == "straight" else scale.draw_circular
+            draw(job["output"], job["draw_specs"], backend=self.backend, merge_lines=self.merge_lines)
+        except Exception as error:
+            print("Unable to draw " + job["name"] + ": " + type(error).__name__ + ": " + str(error))
+            return False
+        return True
+
+    # Gets the modification time and size of all files in the scale specs directories, of all compiled spec files and of
+    # all draw specs files
+    def _snapshot(self):
+        snapshot = {}
+        listed_dirs = set()
+        for job in self.jobs:
+            specs_dir = os.path.normpath(job["scale_specs_dir"])
+            if specs_dir not in listed_dirs:
+                listed_dirs.add(specs_dir)
+                if os.path.isfile(specs_dir):
+                    snapshot[specs_dir] = _stat(specs_dir)
+                else:
+                    try:
+                        for entry in os.scandir(specs_dir):
+                            if entry.is_file():
+                                stat = entry.stat()
+                                snapshot[os.path.normpath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+                    except FileNotFoundError:
+                        pass
+            draw_specs = os.path.normpath(job["draw_specs"])
+            snapshot[draw_specs] = _stat(draw_specs)
+        return snapshot
+
+
+# Gets the modification time and size of a file, or None if it does not exist
+def _stat(filename):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python SlideRuleWatch.py manifest.csv [interval]")
+    SlideRuleWatch(sys.argv[1]).watch(interval=float(sys.argv[2]) if len(sys.argv) == 3 else 0.2)
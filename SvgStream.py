@@ -0,0 +1,145 @@
+# Streaming svg writer with the same drawing interface as svgwrite.Drawing (line, circle, text, add and save).
+# Instead of building an element tree that is only serialized when saved, each element is turned into markup as it is
+# added and written to the output in chunks. The markup is the same that svgwrite generates for the same elements.
+# - filename: name of the output file, or a file-like object opened in text mode
+# - size: width and height of the svg
+# - viewBox: svg viewBox
+# - merge_lines: whether all lines should be drawn as a single path (one per stroke style) instead of one line each.
+#                Merged paths are written when the svg is saved (or their group is closed), so they are drawn over all
+#                other elements
+# - chunk_size: number of elements held before they are written to the output
+# - styles: (optional) css rules shared by all elements, as a dictionary of selectors and their declarations. They are
+#           written in a style element, in the defs of the svg
+class SvgStream:
+    def __init__(self, filename, size=("100%", "100%"), viewBox=None, merge_lines=False, chunk_size=4096, styles=None):
+        self.filename = filename
+        self.merge_lines = merge_lines
+        self.chunk_size = chunk_size
+
+        # Opens the output file, unless a file-like object was given
+        if hasattr(filename, "write"):
+            self._file = filename
+            self._close_file = False
+        else:
+            self._file = open(filename, "w", encoding="utf-8")
+            self._close_file = True
+
+        # Elements waiting to be written, and path commands of merged lines for each stroke style
+        self._chunk = []
+        self._paths = {}
+
+        attributes = {
+            "baseProfile": "full",
+            "height": size[1],
+            "version": "1.1",
+            "width": size[0],
+            "xmlns": "http://www.w3.org/2000/svg",
+            "xmlns:ev": "http://www.w3.org/2001/xml-events",
+            "xmlns:xlink": "http://www.w3.org/1999/xlink"
+        }
+        if viewBox is not None:
+            attributes["viewBox"] = viewBox
+        self._file.write('<?xml version="1.0" encoding="utf-8" ?>\n' + _start_tag("svg", attributes))
+        if styles:
+            rules = "".join(selector + "{" + declarations + "}" for selector, declarations in styles.items())
+            self._file.write('<defs><style type="text/css">' + _escape(rules) + "</style></defs>")
+        else:
+            self._file.write("<defs />")
+
+    # Creates the markup of a line. When lines are merged, creates a path segment instead
+    def line(self, start=(0, 0), end=(0, 0), **extra):
+        if self.merge_lines:
+            return _PathSegment(start, end, tuple(sorted((name, str(value)) for name, value in extra.items())))
+        return _element("line", dict(extra, x1=start[0], y1=start[1], x2=end[0], y2=end[1]))
+
+    # Creates the markup of a circle
+    def circle(self, center=(0, 0), r=1, **extra):
+        return _element("circle", dict(extra, cx=center[0], cy=center[1], r=r))
+
+    # Creates the markup of a text
+    def text(self, text, insert=None, **extra):
+        if insert is not None:
+            extra = dict(extra, x=insert[0], y=insert[1])
+        return _element("text", extra, text)
+
+    # Creates the markup of a path
+    def path(self, d, **extra):
+        return _element("path", dict(extra, d=d))
+
+    # Adds an element to the svg. Elements are written in chunks. Path segments are kept until the svg is saved
+    def add(self, element):
+        if isinstance(element, _PathSegment):
+            commands = self._paths.setdefault(element.style, [])
+            commands.append("M" + str(element.start[0]) + " " + str(element.start[1]) +
+                            "L" + str(element.end[0]) + " " + str(element.end[1]))
+            return element
+        self._chunk.append(element)
+        if len(self._chunk) >= self.chunk_size:
+            self._flush()
+        return element
+
+    # Starts a group of elements. All elements added until the group is closed are in the group
+    def open_group(self, **extra):
+        self._chunk.append(_start_tag("g", extra))
+
+    # Ends the last group that was opened. Lines of the group that are merged are written in it
+    def close_group(self):
+        self._add_paths()
+        self._chunk.append("</g>")
+
+    # Writes the pending elements, merged lines and the end of the svg. Closes the output file if it was opened here
+    def save(self):
+        self._add_paths()
+        self._flush()
+        self._file.write("</svg>")
+        if self._close_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    # Adds the paths of the merged lines, one for each stroke style
+    def _add_paths(self):
+        for style, commands in self._paths.items():
+            self._chunk.append(self.path("".join(commands), fill="none", **dict(style)))
+        self._paths = {}
+
+    # Writes the pending elements to the output
+    def _flush(self):
+        self._file.write("".join(self._chunk))
+        self._chunk = []
+
+
+# Line from start to end, with its style, to be merged into a path
+class _PathSegment:
+    __slots__ = ["start", "end", "style"]
+
+    def __init__(self, start, end, style):
+        self.start = start
+        self.end = end
+        self.style = style
+
+
+# Creates the start tag of an element. Attributes are sorted, have trailing "_" removed (class_ as class) and other "_"
+# replaced by "-", in the same way as svgwrite
+def _start_tag(tag, attributes):
+    attributes = sorted([(name.rstrip("_").replace("_", "-"), str(value)) for name, value in attributes.items()])
+    return "<" + tag + "".join([" " + name + '="' + _escape_attribute(value) + '"' for name, value in attributes]) + ">"
+
+
+# Escapes an attribute value. Most values are numbers, which are kept as they are
+def _escape_attribute(value):
+    if "&" in value or "<" in value or ">" in value or '"' in value:
+        return _escape(value).replace('"', "&quot;")
+    return value
+
+
+# Escapes "&", "<" and ">" in text, as xml.sax.saxutils.escape does (which imports urllib, and would slow imports down)
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+# Creates the markup of an element, with or without text
+def _element(tag, attributes, text=None):
+    if text is None:
+        return _start_tag(tag, attributes)[:-1] + " />"
+    return _start_tag(tag, attributes) + _escape(str(text)) + "</" + tag + ">"
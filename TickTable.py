@@ -0,0 +1,307 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+# Compact columnar table with every position (tick) of a scale and how it is represented.
+# - Positions are kept in their own float64 array, so tables with different positions can share everything else
+# - Other numeric properties are kept together in one contiguous float64 block, one row per column
+# - Fonts and anchors are interned in small tables of distinct values and referred to by code (-1 when blank)
+# - Names are packed in a single UTF-8 buffer, delimited by offsets
+class TickTable:
+    # Columns in the same order as the spec files (after the position column is added)
+    COLUMNS = ["name", "position", "l_position_tip", "l_position_base", "l_width",
+               "t_font", "t_size", "t_anchor", "t_position_x", "t_position_y", "t_angle"]
+    PROPERTY_COLUMNS = ["l_position_tip", "l_position_base", "l_width",
+                        "t_size", "t_position_x", "t_position_y", "t_angle"]
+    NUMERIC_COLUMNS = ["position"] + PROPERTY_COLUMNS
+    INTERNED_COLUMNS = ["t_font", "t_anchor"]
+    # Start of compiled files, and version of their format
+    COMPILED_MAGIC = b"SRSCALE\0"
+    COMPILED_VERSION = 1
+
+    def __init__(self, name_buffer, name_offsets, position, values, codes, tables):
+        self.name_buffer = name_buffer  # uint8 array with all names, UTF-8 encoded, one after the other
+        self.name_offsets = name_offsets  # int64 array with the start of each name, plus the end of the last one
+        self.position = position  # float64 array with the position of each tick
+        self.values = values  # float64 array, one row per numeric property column
+        self.codes = codes  # int16 array, one row per interned column
+        self.tables = tables  # Tuple of distinct strings for each interned column
+
+    # Creates a table from columns. Columns are lists or arrays of the same length, or single values that are repeated.
+    # Missing columns and non-string interned values (such as NaN from blank cells) are considered blank
+    @classmethod
+    def from_columns(cls, columns, length=None):
+        if length is None:
+            length = len(columns["name"])
+        name_buffer, name_offsets = _pack_names(columns["name"] if length else [])
+
+        position = np.full(length, np.nan)
+        if "position" in columns:
+            position[:] = np.asarray(columns["position"], dtype=float)
+        values = np.full((len(cls.PROPERTY_COLUMNS), length), np.nan)
+        for i, column in enumerate(cls.PROPERTY_COLUMNS):
+            if column in columns:
+                values[i] = np.asarray(columns[column], dtype=float)
+
+        codes = np.full((len(cls.INTERNED_COLUMNS), length), -1, dtype=np.int16)
+        tables = []
+        for i, column in enumerate(cls.INTERNED_COLUMNS):
+            table = []
+            if column in columns:
+                column_values = columns[column]
+                if isinstance(column_values, str) or np.ndim(column_values) == 0:
+                    column_values = [column_values] * length
+                lookup = {}
+                for j, value in enumerate(column_values):
+                    if isinstance(value, str):
+                        if value not in lookup:
+                            lookup[value] = len(table)
+                            table.append(value)
+                        codes[i, j] = lookup[value]
+            tables.append(tuple(table))
+
+        return cls(name_buffer, name_offsets, position, values, codes, tables)
+
+    # Creates a table from a pandas DataFrame with the spec files columns
+    @classmethod
+    def from_dataframe(cls, frame):
+        return cls.from_columns({column: frame[column].to_numpy() for column in frame.columns}, len(frame))
+
+    # Joins several tables into one, one after the other. Interned tables are merged, and their codes remapped
+    @classmethod
+    def concatenate(cls, tick_tables):
+        tick_tables = list(tick_tables)
+        if not tick_tables:
+            return cls.from_columns({}, 0)
+
+        name_offsets = [np.zeros(1, dtype=np.int64)]
+        end = 0
+        for tick_table in tick_tables:
+            name_offsets.append(tick_table.name_offsets[1:] + end)
+            end += tick_table.name_offsets[-1]
+
+        codes = []
+        tables = []
+        for i in range(len(cls.INTERNED_COLUMNS)):
+            table = []
+            lookup = {}
+            column_codes = []
+            for tick_table in tick_tables:
+                # Remap of each code of this table to the merged table. The last entry keeps blanks (-1) as blanks
+                remap = np.full(len(tick_table.tables[i]) + 1, -1, dtype=np.int16)
+                for j, value in enumerate(tick_table.tables[i]):
+                    if value not in lookup:
+                        lookup[value] = len(table)
+                        table.append(value)
+                    remap[j] = lookup[value]
+                column_codes.append(remap[tick_table.codes[i]])
+            codes.append(np.concatenate(column_codes))
+            tables.append(tuple(table))
+
+        return cls(
+            np.concatenate([tick_table.name_buffer for tick_table in tick_tables]),
+            np.concatenate(name_offsets),
+            np.concatenate([tick_table.position for tick_table in tick_tables]),
+            np.concatenate([tick_table.values for tick_table in tick_tables], axis=1),
+            np.array(codes, dtype=np.int16).reshape(len(cls.INTERNED_COLUMNS), -1),
+            tables
+        )
+
+    # Number of positions in the table
+    def __len__(self):
+        return len(self.name_offsets) - 1
+
+    # Gets a column: a list of names, an array of numeric values or an array of interned values (None when blank)
+    def __getitem__(self, column):
+        if column == "name":
+            return self.names()
+        if column == "position":
+            return self.position
+        if column in self.PROPERTY_COLUMNS:
+            return self.values[self.PROPERTY_COLUMNS.index(column)]
+        if column in self.INTERNED_COLUMNS:
+            i = self.INTERNED_COLUMNS.index(column)
+            table = np.array(self.tables[i] + (None,), dtype=object)  # Code -1 points to the last entry, None
+            return table[self.codes[i]]
+        raise KeyError(column)
+
+    # Sets all values of a numeric column. Arrays are replaced instead of edited, so tables sharing them are not
+    # affected
+    def __setitem__(self, column, values):
+        if column == "position":
+            self.position = np.broadcast_to(np.asarray(values, dtype=float), len(self)).copy()
+        elif column in self.PROPERTY_COLUMNS:
+            self.values = self.values.copy()
+            self.values[self.PROPERTY_COLUMNS.index(column)] = values
+        else:
+            raise KeyError(column)
+
+    # Creates a table with the given positions, sharing everything else with this table
+    def with_position(self, position):
+        return TickTable(self.name_buffer, self.name_offsets, position, self.values, self.codes, self.tables)
+
+    # Creates a table with the given names, sharing everything else with this table
+    def with_names(self, names):
+        name_buffer, name_offsets = _pack_names(names)
+        return TickTable(name_buffer, name_offsets, self.position, self.values, self.codes, self.tables)
+
+    # Makes all arrays of the table read only, so that tables sharing them can't be affected by accident
+    def freeze(self):
+        for array in [self.name_buffer, self.name_offsets, self.position, self.values, self.codes]:
+            array.flags.writeable = False
+        return self
+
+    # Gets the names of all positions as a list of strings
+    def names(self):
+        name_buffer = self.name_buffer.tobytes()
+        name_offsets = self.name_offsets.tolist()
+        return [name_buffer[start:end].decode() for start, end in zip(name_offsets[:-1], name_offsets[1:])]
+
+    # Gets which positions have text. Positions with any blank text property (starting with t_) have no text
+    def has_text(self):
+        text_rows = [i for i, column in enumerate(self.PROPERTY_COLUMNS) if column.startswith("t_")]
+        return ~np.isnan(self.values[text_rows]).any(axis=0) & (self.codes >= 0).all(axis=0)
+
+    # Creates a new table with the positions of the given indices (or boolean mask), in the given order
+    def take(self, indices):
+        indices = np.arange(len(self))[indices]
+        starts = self.name_offsets[indices]
+        lengths = self.name_offsets[indices + 1] - starts
+        name_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=name_offsets[1:])
+        # Index of every byte of the selected names in the original buffer
+        byte_indices = np.repeat(starts - name_offsets[:-1], lengths) + np.arange(name_offsets[-1])
+        return TickTable(
+            self.name_buffer[byte_indices],
+            name_offsets,
+            self.position[indices],
+            self.values[:, indices],
+            self.codes[:, indices],
+            list(self.tables)
+        )
+
+    # Iterates over each position (or only over the given indices), as a dictionary of its values plus whether it has
+    # text
+    def rows(self, indices=None):
+        tick_table = self if indices is None else self.take(indices)
+        columns = {column: tick_table[column] for column in self.COLUMNS}
+        columns["has_text"] = tick_table.has_text()
+        for values in zip(*[column if isinstance(column, list) else column.tolist() for column in columns.values()]):
+            yield dict(zip(columns.keys(), values))
+
+    # Memory used by the arrays of the table, in bytes
+    @property
+    def nbytes(self):
+        return (self.name_buffer.nbytes + self.name_offsets.nbytes + self.position.nbytes + self.values.nbytes +
+                self.codes.nbytes)
+
+    # Saves the table to a file (name or binary file-like object), in NumPy's npz format
+    def save(self, file):
+        np.savez(
+            file,
+            name_buffer=self.name_buffer,
+            name_offsets=self.name_offsets,
+            position=self.position,
+            values=self.values,
+            codes=self.codes,
+            # Interned tables are saved as a single string each, with values separated by null characters
+            tables=np.array(["\0".join(table) for table in self.tables])
+        )
+
+    # Loads a table saved with save
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as arrays:
+            tables = [tuple(table.split("\0")) if table else () for table in arrays["tables"].tolist()]
+            return cls(arrays["name_buffer"], arrays["name_offsets"], arrays["position"], arrays["values"],
+                       arrays["codes"], tables)
+
+    # Saves the table to a compiled file: a header followed by each array, uncompressed, so that they can be memory
+    # mapped with no parsing. Metadata (a dictionary of json values) is saved in the header.
+    # The file starts with COMPILED_MAGIC and the length of the json header (8 bytes, little endian). Arrays start at
+    # multiples of 64 bytes, and their dtypes, shapes and offsets are listed in the header.
+    # The file is written to a temporary file and then moved into place, so that tables already loaded from it (which
+    # keep views of the memory mapped file) keep the old file
+    def save_compiled(self, filename, metadata=None):
+        arrays = {"name_buffer": self.name_buffer, "name_offsets": self.name_offsets, "position": self.position,
+                  "values": self.values, "codes": self.codes}
+        header = {"version": self.COMPILED_VERSION, "tables": [list(table) for table in self.tables],
+                  "metadata": metadata or {}, "arrays": {}}
+
+        # Offsets depend on the header length, which depends on the offsets. Arrays are moved further until the
+        # header fits before them
+        start = 0
+        while True:
+            offset = start
+            for name, array in arrays.items():
+                header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+                offset = _align(offset + array.nbytes)
+            header_data = json.dumps(header).encode()
+            header_end = _align(len(self.COMPILED_MAGIC) + 8 + len(header_data))
+            if header_end <= start:
+                break
+            start = header_end
+
+        descriptor, temporary_path = tempfile.mkstemp(prefix=".", dir=os.path.dirname(os.path.abspath(filename)))
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(self.COMPILED_MAGIC + len(header_data).to_bytes(8, "little") + header_data)
+                for name, array in arrays.items():
+                    file.write(b"\0" * (header["arrays"][name]["offset"] - file.tell()))
+                    file.write(np.ascontiguousarray(array).tobytes())
+            # Temporary files are only readable by their owner. The compiled file gets the mode of any new file
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temporary_path, 0o666 & ~umask)
+            os.replace(temporary_path, filename)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    # Loads a table saved with save_compiled. The arrays are read only views of the memory mapped file, so only the
+    # parts that are used are read. Returns the table and its metadata
+    @classmethod
+    def load_compiled(cls, filename):
+        with open(filename, "rb") as file:
+            magic = file.read(len(cls.COMPILED_MAGIC))
+            if magic != cls.COMPILED_MAGIC:
+                raise ValueError("Not a compiled scale spec file: '" + str(filename) + "'")
+            header = json.loads(file.read(int.from_bytes(file.read(8), "little")))
+        if header["version"] != cls.COMPILED_VERSION:
+            raise ValueError("Unsupported compiled scale spec version: " + str(header["version"]))
+
+        data = np.memmap(filename, dtype=np.uint8, mode="r")
+        arrays = {}
+        for name, layout in header["arrays"].items():
+            dtype = np.dtype(layout["dtype"])
+            size = int(np.prod(layout["shape"])) * dtype.itemsize
+            arrays[name] = data[layout["offset"]:layout["offset"] + size].view(dtype).reshape(layout["shape"])
+        tables = [tuple(table) for table in header["tables"]]
+        return cls(tables=tables, **arrays), header["metadata"]
+
+    # Converts the table to a pandas DataFrame with the spec files columns. Blank values are NaN
+    def to_dataframe(self):
+        import pandas as pd
+
+        columns = {}
+        for column in self.COLUMNS:
+            columns[column] = self[column]
+        frame = pd.DataFrame(columns, columns=self.COLUMNS)
+        frame[self.INTERNED_COLUMNS] = frame[self.INTERNED_COLUMNS].fillna(np.nan)
+        return frame
+
+
+# Packs names in a single UTF-8 buffer. Returns the buffer and the offsets of the names
+def _pack_names(names):
+    encoded = [str(name).encode() for name in names]
+    name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8).copy(), name_offsets
+
+
+# Rounds an offset up to a multiple of 64 bytes
+def _align(offset):
+    return -(-offset // 64) * 64